@@ -0,0 +1,205 @@
+#!/usr/bin/python3
+
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+import numpy as np
+import StarConstellationExtractor as extractor
+from ConstellationRenderer import getRenderer
+from PageFetcher import PageFetcher
+from StarConstellationExtractor import Constellation
+from TSVTableParser import TSVTableParser
+
+fixture_directory = os.path.join('benchmarks', 'fixtures')
+result_directory = os.path.join('benchmarks', 'results')
+stages = ['parse', 'convert', 'resolve', 'scale', 'json', 'render']
+synthetic_sizes = [1000, 5000, 20000]
+fixture_star_count = 200
+greek_letters = ['Alp', 'Bet', 'Gam', 'Del', 'Eps', 'Zet', 'Eta', 'The', 'Iot', 'Kap', 'Lam', 'Mu', 'Nu', 'Xi', 'Omi', 'Pi', 'Rho', 'Sig', 'Tau', 'Ups', 'Phi', 'Chi', 'Psi', 'Ome']
+
+def getFixturePath(latin_name: str):
+    return os.path.join(fixture_directory, latin_name + '.tsv')
+
+def recordFixtures():
+    # Downloads the current VizieR pages of all constellations once
+    os.makedirs(fixture_directory, exist_ok=True)
+    fetcher = PageFetcher(max_workers=extractor.max_concurrent_downloads, max_per_host=extractor.max_downloads_per_host)
+    for constellation, page in fetcher.fetchAll(extractor.constellation_list, 'table_url'):
+        with open(getFixturePath(constellation.latin_name), 'w', encoding='utf-8') as outfile:
+            outfile.write(page)
+        print('Recorded', constellation.latin_name)
+    fetcher.close()
+
+def formatPage(title: str, catalogue_numbers, right_ascension, declination, visual_magnitude, bayer_designations):
+    # VizieR's tab-separated format, right ascension in hours and declination in degrees
+    lines = ['#', '# ' + title, '',
+             'Full\tHD\tRAJ2000\tDEJ2000\tVmag\tBayer', ' \t \t"h:m:s"\t"d:m:s"\tmag\t ', '----\t------\t----------\t---------\t-----\t-----']
+    for index in range(len(catalogue_numbers)):
+        # Rounded to tenths of a second first, so the seconds never read 60.0
+        tenths = int(round(right_ascension[index] * 36000)) % (24 * 36000)
+        degrees = abs(declination[index])
+        sign = '-' if declination[index] < 0 else '+'
+        lines.append('%d\t%d\t%02d %02d %04.1f\t%s%02d %02d %02d\t%.2f\t%s' % (index + 1, catalogue_numbers[index], tenths // 36000, tenths // 600 % 60, tenths % 600 / 10,
+                                                                          sign, int(degrees), int(degrees * 60) % 60, int(degrees * 3600) % 60, visual_magnitude[index], bayer_designations[index]))
+    return '\n'.join(lines) + '\n'
+
+def makeSyntheticPage(star_count: int, seed: int = 0):
+    # A constellation page in VizieR's tab-separated format and a connection list through its brightest stars
+    generator = np.random.default_rng(seed)
+    right_ascension = generator.uniform(10.0, 12.0, star_count)
+    declination = generator.uniform(-20.0, 20.0, star_count)
+    visual_magnitude = np.sort(generator.uniform(-1.0, 12.0, star_count))
+    page = formatPage('Synthetic constellation with %d stars' % star_count, range(100000, 100000 + star_count), right_ascension, declination,
+                      visual_magnitude, ['Alp' if index == 0 else '' for index in range(star_count)])
+    connections = (100000 + generator.integers(0, min(star_count, 500), min(star_count, 2000))).tolist()
+    return page, connections
+
+def makeFixturePage(constellation: Constellation, owned: list, seed: int):
+    # A stand-in for the VizieR page of a constellation: fixture_star_count stars around a random centre, the brightest
+    # of them carry the HD numbers of the connections this constellation owns, the others get numbers nobody connects
+    generator = np.random.default_rng(seed)
+    centre_ra = generator.uniform(0.0, 24.0)
+    centre_dec = np.degrees(np.arcsin(generator.uniform(-0.95, 0.95)))
+    declination = np.clip(centre_dec + generator.normal(0.0, 8.0, fixture_star_count), -89.9, 89.9)
+    right_ascension = (centre_ra + generator.normal(0.0, 8.0, fixture_star_count) / 15.0 / np.cos(np.radians(declination))) % 24.0
+    visual_magnitude = np.sort(generator.uniform(0.0, 8.0, fixture_star_count))
+    catalogue_numbers = owned + [300000 + seed * 1000 + index for index in range(fixture_star_count - len(owned))]
+    bayer_designations = [greek_letters[index] if index < len(greek_letters) else '' for index in range(fixture_star_count)]
+    return formatPage('Generated stand-in for ' + constellation.latin_name, catalogue_numbers, right_ascension, declination, visual_magnitude, bayer_designations)
+
+def generateFixtures():
+    # Deterministic fixtures for all constellations, a connection star shared by several figures belongs to the first one
+    # like in the catalogue, so the others borrow it
+    os.makedirs(fixture_directory, exist_ok=True)
+    owners = {}
+    for constellation in extractor.constellation_list:
+        for catalogue_number in constellation.connection_list:
+            owners.setdefault(catalogue_number, constellation.latin_name)
+    for seed, constellation in enumerate(extractor.constellation_list):
+        owned = [catalogue_number for catalogue_number in dict.fromkeys(constellation.connection_list) if owners[catalogue_number] == constellation.latin_name]
+        with open(getFixturePath(constellation.latin_name), 'w', encoding='utf-8', newline='\n') as outfile:
+            outfile.write(makeFixturePage(constellation, owned, seed))
+        print('Generated', constellation.latin_name)
+
+def runStages(template: Constellation, page: str, measurements: dict):
+    # Runs every pipeline stage on a fresh constellation and stores the duration of each stage, or its peak memory while tracemalloc is tracing
+    constellation = Constellation(template.latin_name, template.german_name, template.english_name, template.url, template.connection_list)
+    with contextlib.redirect_stdout(io.StringIO()):
+        for stage in stages:
+            if tracemalloc.is_tracing():
+                tracemalloc.reset_peak()
+            start = time.perf_counter()
+            if stage == 'parse':
+                table = TSVTableParser().parseText(page)
+                constellation.addStarTable(table)
+            elif stage == 'convert':
+                constellation.convertCoordinates()
+            elif stage == 'scale':
+                constellation.scaleCoordinates(extractor.x_target, extractor.y_target, extractor.border_size)
+            elif stage == 'resolve':
+                constellation.resolveConnections()
+            elif stage == 'json':
+                extractor.formatJSON(constellation.getJSONData())
+            elif stage == 'render':
+                getRenderer('png', extractor.x_target, extractor.y_target).renderBytes(constellation.getScene())
+            duration = time.perf_counter() - start
+            measurements[stage] = tracemalloc.get_traced_memory()[1] if tracemalloc.is_tracing() else duration
+    return constellation
+
+def benchmarkConstellation(template: Constellation, page: str, repetitions: int):
+    seconds = {stage: float('inf') for stage in stages}
+    for repetition in range(repetitions):
+        timings = {}
+        constellation = runStages(template, page, timings)
+        for stage in stages:
+            seconds[stage] = min(seconds[stage], timings[stage])
+    # A separate run for the memory, tracing slows everything down
+    peak_bytes = {}
+    tracemalloc.start()
+    runStages(template, page, peak_bytes)
+    tracemalloc.stop()
+    star_count = len(constellation.star_list)
+    return {'stars': star_count, 'edges': len(constellation.edges), 'bytes_per_star': constellation.getStarBytes() / max(star_count, 1), 'seconds': seconds, 'peak_bytes': peak_bytes}
+
+def runBenchmark(repetitions: int, synthetic: bool):
+    results = {}
+    missing = []
+    for constellation in extractor.constellation_list:
+        try:
+            with open(getFixturePath(constellation.latin_name), encoding='utf-8') as infile:
+                page = infile.read()
+        except FileNotFoundError:
+            missing.append(constellation.latin_name)
+            continue
+        results[constellation.latin_name] = benchmarkConstellation(constellation, page, repetitions)
+        print(constellation.latin_name, '%.2f ms' % (sum(results[constellation.latin_name]['seconds'].values()) * 1000))
+    if missing:
+        print('WARNING: No fixtures for', len(missing), 'constellations, record them with --record or --generate')
+    if synthetic:
+        for star_count in synthetic_sizes:
+            page, connections = makeSyntheticPage(star_count)
+            name = 'Synthetic %d' % star_count
+            results[name] = benchmarkConstellation(Constellation(name, name, name, '', connections), page, repetitions)
+            print(name, '%.2f ms' % (sum(results[name]['seconds'].values()) * 1000))
+    totals = {stage: sum(result['seconds'][stage] for name, result in results.items() if not name.startswith('Synthetic')) for stage in stages}
+    return {
+        'created': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'repetitions': repetitions,
+        'totals': totals,
+        'results': results
+    }
+
+def compareResults(previous: dict, current: dict, threshold: float):
+    # Prints every stage that got slower by more than threshold and returns their number
+    regressions = 0
+    pairs = [('Total', previous['totals'], current['totals'])]
+    for name, result in current['results'].items():
+        if name in previous['results']:
+            pairs.append((name, previous['results'][name]['seconds'], result['seconds']))
+    for name, before, after in pairs:
+        for stage in stages:
+            if before.get(stage, 0) > 0 and after[stage] / before[stage] > 1 + threshold:
+                print('REGRESSION:', name, stage, '%.3f ms -> %.3f ms' % (before[stage] * 1000, after[stage] * 1000))
+                regressions += 1
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Times every pipeline stage on recorded VizieR pages.')
+    parser.add_argument('--record', action='store_true', help='download the fixtures from VizieR before benchmarking')
+    parser.add_argument('--generate', action='store_true', help='write deterministic stand-in fixtures instead of downloading them')
+    parser.add_argument('--repetitions', type=int, default=5, help='runs per constellation, the fastest one counts')
+    parser.add_argument('--no-synthetic', action='store_true', help='skip the synthetic large constellations')
+    parser.add_argument('--output', help='result file, default benchmarks/results/<time>.json')
+    parser.add_argument('--compare', help='earlier result file to compare with')
+    parser.add_argument('--threshold', type=float, default=0.2, help='relative slowdown reported as regression')
+    arguments = parser.parse_args()
+    if arguments.record:
+        recordFixtures()
+    elif arguments.generate:
+        generateFixtures()
+    results = runBenchmark(arguments.repetitions, not arguments.no_synthetic)
+    output = arguments.output
+    if output is None:
+        os.makedirs(result_directory, exist_ok=True)
+        output = os.path.join(result_directory, results['created'].replace(':', '-') + '.json')
+    with open(output, 'w') as outfile:
+        json.dump(results, outfile, indent=2)
+    print('Results written to', output)
+    for stage in stages:
+        print(stage, '%.2f ms' % (results['totals'][stage] * 1000))
+    if arguments.compare:
+        with open(arguments.compare) as infile:
+            if compareResults(json.load(infile), results, arguments.threshold) > 0:
+                sys.exit(1)
+
+if __name__ == '__main__':
+    main()
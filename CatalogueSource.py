@@ -0,0 +1,212 @@
+#!/usr/bin/python3
+
+import mmap
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from urllib.parse import quote
+import numpy as np
+from TSVTableParser import TSVTableParser
+
+# Increase whenever the layout of the bulk catalogue index changes
+index_version = 2
+# Rows per page of queries with a magnitude limit but without a page size
+magnitude_page_size = 10000
+
+def getPageURL(table_url: str, page_size: int = None, skip: int = 0, magnitude_limit: float = None):
+    # The query of a constellation restricted to one page of page_size rows and to stars up to magnitude_limit
+    if page_size is not None:
+        parts = [part for part in table_url.split('&') if not part.startswith('-out.max=') and not part.startswith('-skip=')]
+        table_url = '&'.join(parts) + '&-out.max=%d' % page_size
+        if skip > 0:
+            table_url += '&-skip=%d' % skip
+    if magnitude_limit is not None:
+        table_url += '&Vmag=' + quote('<=%g' % magnitude_limit)
+    return table_url
+
+def iterPageTables(fetcher, table_url: str, page_size: int = None, chunk_size: int = None, magnitude_limit: float = None, fingerprint=None, urls: list = None):
+    """Yields StarTables of at most chunk_size stars from the pages of a VizieR query, one page in memory at a time.
+
+    Without page_size only the single page of the query is read, otherwise pages of page_size rows
+    are requested until one comes back shorter. With a magnitude limit the query is always paged, its
+    row limit would cut off the fainter stars. fingerprint (a hashlib object) is updated with every page
+    and the url of every page is appended to urls, so the caller can look up its fetch time.
+    """
+    if page_size is None and magnitude_limit is not None:
+        page_size = magnitude_page_size
+    parser = TSVTableParser()
+    skip = 0
+    while True:
+        url = getPageURL(table_url, page_size, skip, magnitude_limit)
+        page = fetcher.fetch(url)
+        if urls is not None:
+            urls.append(url)
+        if fingerprint is not None:
+            fingerprint.update(page.encode('utf-8'))
+        rows = parser.rows
+        yield from parser.parseChunks(page.splitlines(), chunk_size)
+        del page
+        if page_size is None or parser.rows - rows < page_size:
+            return
+        skip += page_size
+
+class BulkCatalogue():
+    """Memory maps a local tab-separated catalogue of all constellations, like IV/27 saved from VizieR as TSV.
+
+    Besides the star columns of TSVTableParser the table needs a Cst column with the constellation
+    abbreviation. A sidecar index (path.index.npz) stores the offset and the Henry Draper Catalog
+    Number of every data line grouped by constellation and sorted by visual magnitude like the VizieR
+    queries, it is rebuilt whenever the catalogue file changes. Only the lines of the requested
+    constellation are read.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self.file = open(path, 'rb')
+        self.buffer = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.index_path = path + '.index.npz'
+        status = os.stat(path)
+        self.source = np.array([index_version, status.st_size, status.st_mtime_ns], dtype=np.int64)
+        if not self.loadIndex():
+            self.buildIndex()
+
+    def loadIndex(self):
+        try:
+            with np.load(self.index_path) as index:
+                if not np.array_equal(index['source'], self.source):
+                    return False
+                self.header = index['header'].tolist()
+                self.abbreviations = index['abbreviations'].tolist()
+                self.starts = index['starts']
+                self.offsets = index['offsets']
+                self.magnitudes = index['magnitudes']
+                self.catalogue_numbers = index['catalogue_numbers']
+        except (OSError, KeyError, ValueError):
+            return False
+        return True
+
+    def buildIndex(self):
+        header = None
+        skip = 0
+        groups = {}
+        position = 0
+        while position < len(self.buffer):
+            end = self.buffer.find(b'\n', position)
+            if end < 0:
+                end = len(self.buffer)
+            line = self.buffer[position:end].decode('utf-8').rstrip('\r')
+            offset = position
+            position = end + 1
+            if header is None:
+                if line != '' and not line.startswith('#'):
+                    header = [name.strip() for name in line.split('\t')]
+                    if 'Cst' not in header:
+                        raise ValueError('Column Cst is missing in the header of ' + self.path)
+                    indices = TSVTableParser().getColumnIndices(header)
+                    constellation_column = header.index('Cst')
+                    skip = 2
+                continue
+            if skip > 0:
+                skip -= 1
+                continue
+            if line == '' or line.startswith('#'):
+                break
+            fields = line.split('\t')
+            abbreviation = fields[constellation_column].strip() if constellation_column < len(fields) else ''
+            try:
+                visual_magnitude = float(fields[indices['Vmag']])
+            except (IndexError, ValueError):
+                visual_magnitude = np.inf
+            try:
+                catalogue_number = int(fields[indices['HD']])
+            except (IndexError, ValueError):
+                catalogue_number = -1
+            group = groups.setdefault(abbreviation, ([], [], []))
+            group[0].append(offset)
+            group[1].append(visual_magnitude)
+            group[2].append(catalogue_number)
+        if header is None:
+            raise ValueError(self.path + ' contains no table')
+        self.header = header
+        self.abbreviations = sorted(groups)
+        offsets = []
+        magnitudes = []
+        catalogue_numbers = []
+        for abbreviation in self.abbreviations:
+            group_offsets = np.array(groups[abbreviation][0], dtype=np.int64)
+            group_magnitudes = np.array(groups[abbreviation][1], dtype=np.float32)
+            order = np.argsort(group_magnitudes, kind='stable')
+            offsets.append(group_offsets[order])
+            magnitudes.append(group_magnitudes[order])
+            catalogue_numbers.append(np.array(groups[abbreviation][2], dtype=np.int64)[order])
+        self.starts = np.concatenate(([0], np.cumsum([len(group) for group in offsets]))).astype(np.int64)
+        self.offsets = np.concatenate(offsets) if offsets else np.empty(0, dtype=np.int64)
+        self.magnitudes = np.concatenate(magnitudes) if magnitudes else np.empty(0, dtype=np.float32)
+        self.catalogue_numbers = np.concatenate(catalogue_numbers) if catalogue_numbers else np.empty(0, dtype=np.int64)
+        # Several processes may build the index at the same time, each one writes its own file first
+        file_descriptor, temporary_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.index_path)), suffix='.tmp')
+        with os.fdopen(file_descriptor, 'wb') as outfile:
+            np.savez(outfile, source=self.source, header=np.array(self.header), abbreviations=np.array(self.abbreviations, dtype=str),
+                     starts=self.starts, offsets=self.offsets, magnitudes=self.magnitudes, catalogue_numbers=self.catalogue_numbers)
+        os.replace(temporary_path, self.index_path)
+
+    def getRange(self, abbreviation: str, magnitude_limit: float = None):
+        # Index range of the lines of a constellation, brightest first
+        if abbreviation not in self.abbreviations:
+            return 0, 0
+        group = self.abbreviations.index(abbreviation)
+        start = self.starts[group]
+        end = self.starts[group + 1]
+        if magnitude_limit is not None:
+            end = start + np.searchsorted(self.magnitudes[start:end], np.float32(magnitude_limit), 'right')
+        return start, end
+
+    def getOffsets(self, abbreviation: str, magnitude_limit: float = None):
+        start, end = self.getRange(abbreviation, magnitude_limit)
+        return self.offsets[start:end]
+
+    def getCatalogueNumbers(self, abbreviation: str, magnitude_limit: float = None):
+        # Henry Draper Catalog Numbers of a constellation without reading its lines, -1 for invalid ones
+        start, end = self.getRange(abbreviation, magnitude_limit)
+        return self.catalogue_numbers[start:end]
+
+    def iterLines(self, offsets):
+        # Converts the offsets block by block, so no list of all offsets is created
+        for block in range(0, len(offsets), 4096):
+            for offset in offsets[block:block + 4096].tolist():
+                end = self.buffer.find(b'\n', offset)
+                yield self.buffer[offset:end if end >= 0 else len(self.buffer)].decode('utf-8')
+
+    def iterTables(self, abbreviation: str, chunk_size: int = None, magnitude_limit: float = None, fingerprint=None):
+        """Yields StarTables of at most chunk_size stars of one constellation, fingerprint is updated with every line."""
+        lines = self.iterLines(self.getOffsets(abbreviation, magnitude_limit))
+        if fingerprint is not None:
+            lines = self.hashLines(lines, fingerprint)
+        return TSVTableParser().parseChunks(lines, chunk_size, self.header)
+
+    def hashLines(self, lines, fingerprint):
+        for line in lines:
+            fingerprint.update(line.encode('utf-8'))
+            yield line
+
+    def close(self):
+        self.buffer.close()
+        self.file.close()
+
+if __name__ == '__main__':
+    # Streams one constellation of a bulk catalogue and prints time and peak memory: CatalogueSource.py catalogue.tsv abbreviation [magnitude limit] [chunk size]
+    catalogue = BulkCatalogue(sys.argv[1])
+    magnitude_limit = float(sys.argv[3]) if len(sys.argv) > 3 else None
+    chunk_size = int(sys.argv[4]) if len(sys.argv) > 4 else 10000
+    # Timed without tracing, tracemalloc slows parsing down several times
+    start = time.perf_counter()
+    stars = sum(len(table) for table in catalogue.iterTables(sys.argv[2], chunk_size, magnitude_limit))
+    duration = time.perf_counter() - start
+    tracemalloc.start()
+    for table in catalogue.iterTables(sys.argv[2], chunk_size, magnitude_limit):
+        pass
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(sys.argv[2], stars, 'stars', '%.1f ms' % (duration * 1000), '%.1f KiB peak' % (peak / 1024))
+    catalogue.close()
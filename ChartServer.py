@@ -0,0 +1,373 @@
+#!/usr/bin/python3
+
+import argparse
+import asyncio
+import collections
+import json
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, quote, unquote, urlsplit
+import numpy as np
+import StarConstellationExtractor as extractor
+from ConstellationRenderer import renderer_classes
+from Projection import View
+from StarRegistry import StarRegistry
+
+host = '127.0.0.1'
+port = 8080
+# Bytes of rendered JSON, PNG and SVG data kept in memory
+render_cache_size = 64 * 1024 * 1024
+# Largest width and height a client may request
+max_image_size = 8192
+# Renderers (each with its own canvas) kept for the most recently requested sizes
+renderer_count = 8
+# Render times kept for the latency percentiles
+latency_samples = 1000
+
+content_types = {
+    'json': 'application/json',
+    'png': 'image/png',
+    'svg': 'image/svg+xml'
+}
+
+status_texts = {
+    200: 'OK',
+    400: 'Bad Request',
+    404: 'Not Found',
+    405: 'Method Not Allowed',
+    500: 'Internal Server Error'
+}
+
+class RenderCache():
+    """Least recently used rendered charts, bounded by the total size of their data in bytes."""
+    def __init__(self, max_size: int = 64 * 1024 * 1024):
+        self.max_size = max_size
+        self.size = 0
+        self.entries = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        data = self.entries.get(key)
+        if data is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return data
+
+    def put(self, key, data: bytes):
+        # Data larger than the whole cache is not stored
+        if len(data) > self.max_size:
+            return
+        if key in self.entries:
+            self.size -= len(self.entries.pop(key))
+        self.entries[key] = data
+        self.size += len(data)
+        while self.size > self.max_size:
+            key, evicted = self.entries.popitem(last=False)
+            self.size -= len(evicted)
+            self.evictions += 1
+
+    def getStatistics(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / lookups if lookups > 0 else 0.0,
+            'entries': len(self.entries),
+            'bytes': self.size,
+            'max_bytes': self.max_size,
+            'evictions': self.evictions
+        }
+
+def loadCharts(names: list = None, **settings):
+    """Loads and converts the constellations with the given names once and resolves connections to stars of other pages."""
+    options = extractor.ExtractorOptions(**settings)
+    constellations = [constellation.copy() for constellation in extractor.selectConstellations(names)]
+    extractor.loadConstellations(constellations, options)
+    registry = StarRegistry()
+    for constellation in constellations:
+        registry.addConstellation(constellation)
+    for constellation in constellations:
+        if constellation.unresolved_connections:
+            stars = registry.getStarsByCatalogueNumber(constellation.unresolved_connections)
+            if len(stars['catalogue_number']) > 0:
+                constellation.borrowStars(stars)
+                constellation.resolveConnections()
+    return constellations
+
+class ChartServer():
+    """Serves JSON, PNG and SVG charts of resident constellations, rendered on demand at any size.
+
+    GET /constellations lists the constellations, /constellations/<name>.<json|png|svg> returns a
+    chart; width, height, border and projection query parameters select the view. Rendered charts
+    are kept in a RenderCache and concurrent requests for a chart that is being rendered wait for
+    the same render. Renders run in one thread next to the event loop, the renderers reuse their
+    canvas and every constellation caches its frame. GET /stats reports the cache and render latency.
+    """
+    def __init__(self, constellations: list, cache_size: int = 64 * 1024 * 1024, json_indent: int = 2):
+        self.constellations = constellations
+        self.json_indent = json_indent
+        self.cache = RenderCache(cache_size)
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.renderers = collections.OrderedDict()
+        # Tasks of the charts being rendered by their cache key
+        self.rendering = {}
+        self.coalesced = 0
+        self.requests = 0
+        self.render_times = collections.deque(maxlen=latency_samples)
+        self.render_count = 0
+        self.server = None
+
+    def getConstellation(self, name: str):
+        for constellation in self.constellations:
+            if constellation.matches(name):
+                return constellation
+        return None
+
+    def getView(self, query: dict):
+        # Raises ValueError for invalid parameters
+        def getInteger(name: str, default: int):
+            try:
+                value = int(query[name][-1]) if name in query else default
+            except ValueError:
+                raise ValueError(name + ' has to be an integer')
+            if not 0 <= value <= max_image_size:
+                raise ValueError(name + ' has to be between 0 and %d' % max_image_size)
+            return value
+        view = View(query['projection'][-1] if 'projection' in query else extractor.projection,
+                    getInteger('width', extractor.x_target), getInteger('height', extractor.y_target), getInteger('border', extractor.border_size))
+        if min(view.width, view.height) <= 2 * view.border_size:
+            raise ValueError('The border leaves no space for the chart')
+        return view
+
+    def getRenderer(self, image_format: str, width: int, height: int):
+        key = (image_format, width, height)
+        if key in self.renderers:
+            self.renderers.move_to_end(key)
+        else:
+            self.renderers[key] = renderer_classes[image_format](width, height)
+            if len(self.renderers) > renderer_count:
+                self.renderers.popitem(last=False)
+        return self.renderers[key]
+
+    def render(self, constellation, file_format: str, view: View):
+        # Runs in the render thread
+        start = time.perf_counter()
+        try:
+            if file_format == 'json':
+                data = extractor.formatJSON(constellation.getJSONData(view), self.json_indent).encode('utf-8')
+            else:
+                data = self.getRenderer(file_format, view.width, view.height).renderBytes(constellation.getScene(view))
+        finally:
+            # The frame of the constellation stays, the coordinates of arbitrary sizes would pile up
+            constellation.view_coordinates.pop(view, None)
+        self.render_times.append(time.perf_counter() - start)
+        self.render_count += 1
+        return data
+
+    async def renderChart(self, key, constellation, file_format: str, view: View):
+        data = await asyncio.get_running_loop().run_in_executor(self.executor, self.render, constellation, file_format, view)
+        self.cache.put(key, data)
+        return data
+
+    def finishRender(self, key, task):
+        # Runs on every exit of a render task, also if it was cancelled before it started
+        if self.rendering.get(key) is task:
+            del self.rendering[key]
+        if not task.cancelled():
+            # Marks the exception as retrieved in case no request waits for it any more
+            task.exception()
+
+    async def getChart(self, constellation, file_format: str, view: View):
+        key = (constellation.latin_name, file_format, view.getKey())
+        data = self.cache.get(key)
+        if data is not None:
+            return data
+        if key in self.rendering:
+            self.coalesced += 1
+        else:
+            # The render is a task of its own, a cancelled request (a closed connection) does not cancel it for the
+            # requests waiting for the same chart
+            task = asyncio.ensure_future(self.renderChart(key, constellation, file_format, view))
+            task.add_done_callback(lambda task: self.finishRender(key, task))
+            self.rendering[key] = task
+        return await asyncio.shield(self.rendering[key])
+
+    def getStatistics(self):
+        render_times = np.array(self.render_times) * 1000
+        return {
+            'constellations': len(self.constellations),
+            'stars': sum(len(constellation.star_list) for constellation in self.constellations),
+            'requests': self.requests,
+            'coalesced': self.coalesced,
+            'cache': self.cache.getStatistics(),
+            'renders': {
+                'count': self.render_count,
+                'mean_ms': float(render_times.mean()) if len(render_times) > 0 else 0.0,
+                'p50_ms': float(np.percentile(render_times, 50)) if len(render_times) > 0 else 0.0,
+                'p95_ms': float(np.percentile(render_times, 95)) if len(render_times) > 0 else 0.0,
+                'max_ms': float(render_times.max()) if len(render_times) > 0 else 0.0
+            }
+        }
+
+    async def respond(self, target: str):
+        # Status, content type and body of a GET request
+        parts = urlsplit(target)
+        path = unquote(parts.path)
+        if path == '/stats':
+            return 200, 'application/json', json.dumps(self.getStatistics(), indent=2).encode('utf-8')
+        if path in ('/', '/constellations'):
+            listing = [{'latin': constellation.latin_name, 'german': constellation.german_name, 'english': constellation.english_name,
+                        'abbreviation': constellation.abbreviation, 'stars': len(constellation.star_list)} for constellation in self.constellations]
+            return 200, 'application/json', json.dumps(listing, indent=2).encode('utf-8')
+        name, _, file_format = path[len('/constellations/'):].rpartition('.')
+        constellation = self.getConstellation(name) if path.startswith('/constellations/') and file_format in content_types else None
+        if constellation is None:
+            return 404, 'text/plain', b'Unknown constellation or format\n'
+        try:
+            view = self.getView(parse_qs(parts.query))
+        except ValueError as error:
+            return 400, 'text/plain', (str(error) + '\n').encode('utf-8')
+        return 200, content_types[file_format], await self.getChart(constellation, file_format, view)
+
+    async def handleConnection(self, reader, writer):
+        # HTTP/1.1 with keep-alive, requests of a connection are answered in order
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip().lower()
+                parts = request_line.decode('latin-1').split()
+                if len(parts) != 3:
+                    await self.sendResponse(writer, 400, 'text/plain', b'Malformed request\n', False)
+                    break
+                method, target, version = parts
+                keep_alive = headers.get('connection', 'keep-alive' if version == 'HTTP/1.1' else 'close') == 'keep-alive'
+                self.requests += 1
+                if method not in ('GET', 'HEAD'):
+                    status, content_type, body = 405, 'text/plain', b'Only GET and HEAD are supported\n'
+                else:
+                    try:
+                        status, content_type, body = await self.respond(target)
+                    except Exception as error:
+                        print('ERROR:', target, repr(error))
+                        status, content_type, body = 500, 'text/plain', b'Render failed\n'
+                await self.sendResponse(writer, status, content_type, body, keep_alive, method == 'HEAD')
+                if not keep_alive:
+                    break
+        except (ConnectionError, ValueError):
+            # Closed connections and request lines beyond the stream limit
+            pass
+        finally:
+            writer.close()
+
+    async def sendResponse(self, writer, status: int, content_type: str, body: bytes, keep_alive: bool, head: bool = False):
+        header = 'HTTP/1.1 %d %s\r\nContent-Type: %s\r\nContent-Length: %d\r\nConnection: %s\r\n\r\n' % (
+            status, status_texts[status], content_type, len(body), 'keep-alive' if keep_alive else 'close')
+        writer.write(header.encode('latin-1') + (b'' if head else body))
+        await writer.drain()
+
+    async def start(self, host: str = '127.0.0.1', port: int = 8080):
+        self.server = await asyncio.start_server(self.handleConnection, host, port)
+        return self.server
+
+    def close(self):
+        if self.server is not None:
+            self.server.close()
+        self.executor.shutdown()
+
+async def fetchChart(reader, writer, target: str):
+    # Sends one GET over a keep-alive connection and returns the status and body
+    writer.write(('GET %s HTTP/1.1\r\nHost: localhost\r\n\r\n' % target).encode('latin-1'))
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.lower() == 'content-length':
+            length = int(value)
+    return status, await reader.readexactly(length)
+
+async def runLoadTest(server: ChartServer, host: str, port: int, request_count: int, concurrency: int):
+    # Requests random charts of a few sizes over concurrency connections and prints the throughput and the statistics of the server
+    generator = random.Random(0)
+    sizes = [(1920, 1080), (1280, 720), (800, 800)]
+    targets = ['/constellations/%s.%s?width=%d&height=%d' % ((quote(constellation.latin_name), file_format) + size)
+               for constellation in server.constellations for file_format in content_types for size in sizes]
+    queue = [generator.choice(targets) for request in range(request_count)]
+    latencies = []
+
+    async def client():
+        reader, writer = await asyncio.open_connection(host, port)
+        while queue:
+            target = queue.pop()
+            start = time.perf_counter()
+            status, body = await fetchChart(reader, writer, target)
+            latencies.append(time.perf_counter() - start)
+            if status != 200:
+                print('WARNING:', target, status, body.decode('utf-8', 'replace').strip())
+        writer.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for connection in range(concurrency)))
+    duration = time.perf_counter() - start
+    latencies = np.array(latencies) * 1000
+    print(request_count, 'requests over', concurrency, 'connections: %.0f requests/s, latency p50 %.2f ms, p95 %.2f ms' % (
+        request_count / duration, np.percentile(latencies, 50), np.percentile(latencies, 95)))
+    print(json.dumps(server.getStatistics(), indent=2))
+
+async def serve(server: ChartServer, host: str, port: int, load_test: int = 0, concurrency: int = 16):
+    await server.start(host, port)
+    print('Serving', len(server.constellations), 'constellations on http://%s:%d/constellations' % (host, port))
+    try:
+        if load_test > 0:
+            await runLoadTest(server, host, port, load_test, concurrency)
+        else:
+            await server.server.serve_forever()
+    finally:
+        server.close()
+
+def main():
+    parser = argparse.ArgumentParser(description='Serves JSON, PNG and SVG charts of the constellations, rendered on demand from resident star data.')
+    parser.add_argument('constellations', nargs='*', help='latin, german or english names or abbreviations, all constellations if omitted')
+    parser.add_argument('--host', default=host)
+    parser.add_argument('--port', type=int, default=port)
+    parser.add_argument('--cache-size', type=int, default=render_cache_size // (1024 * 1024), help='megabytes of rendered charts kept in memory (default: %(default)s)')
+    parser.add_argument('--online', action='store_true', help='download pages that are not cached instead of failing')
+    parser.add_argument('--page-size', type=int, default=extractor.page_size, help='read all stars in pages of this many rows instead of the first 200')
+    parser.add_argument('--magnitude-limit', type=float, default=extractor.magnitude_limit, help='only read stars up to this visual magnitude')
+    parser.add_argument('--catalogue', default=extractor.catalogue_file, help='local tab-separated catalogue with a Cst column to read instead of VizieR')
+    parser.add_argument('--load-test', type=int, default=0, metavar='REQUESTS', help='send this many requests to the started server, print the results and exit')
+    parser.add_argument('--concurrency', type=int, default=16, help='connections of the load test (default: %(default)s)')
+    arguments = parser.parse_args()
+
+    try:
+        extractor.selectConstellations(arguments.constellations)
+    except ValueError as error:
+        parser.error(str(error))
+    start = time.perf_counter()
+    constellations = loadCharts(arguments.constellations, offline=not arguments.online, page_size=arguments.page_size,
+                                magnitude_limit=arguments.magnitude_limit, catalogue_file=arguments.catalogue)
+    print('Loaded', len(constellations), 'constellations with', sum(len(constellation.star_list) for constellation in constellations), 'stars in %.2f s' % (time.perf_counter() - start))
+    server = ChartServer(constellations, arguments.cache_size * 1024 * 1024, extractor.json_indent)
+    try:
+        asyncio.run(serve(server, arguments.host, arguments.port, arguments.load_test, arguments.concurrency))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
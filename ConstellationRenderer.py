@@ -0,0 +1,177 @@
+#!/usr/bin/python3
+
+import io
+import sys
+import time
+from xml.sax.saxutils import escape
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+# The brightest stars are drawn black, all others yellow
+highlighted_stars = 15
+background_color = (255, 255, 255)
+line_color = (0, 0, 0)
+highlight_color = (0, 0, 0)
+star_color = (255, 255, 0)
+
+# Palette indices of the PNG canvas
+background_index = 0
+line_index = 1
+highlight_index = 1
+star_index = 2
+
+class Scene():
+    """The arrays needed to draw one constellation, coordinates are already scaled to the canvas.
+
+    highlighted marks the stars drawn in the highlight color, by default the first highlighted_stars.
+    radius_scale scales the marker radius of 10 - visual magnitude pixels.
+    """
+    def __init__(self, x, y, visual_magnitude, labels: list, edges, highlighted=None, radius_scale: float = 1.0):
+        self.x = np.asarray(x, dtype=np.float64)
+        self.y = np.asarray(y, dtype=np.float64)
+        self.visual_magnitude = np.asarray(visual_magnitude, dtype=np.float64)
+        self.labels = labels
+        self.edges = np.asarray(edges, dtype=np.int32).reshape(-1, 2)
+        if highlighted is None:
+            highlighted = np.arange(len(self.x)) < highlighted_stars
+        self.highlighted = np.asarray(highlighted, dtype=bool)
+        self.radius_scale = radius_scale
+
+    def getRadii(self):
+        radii = (np.round(10.0 - self.visual_magnitude, 2) * self.radius_scale).astype(np.int64)
+        return np.maximum(radii, 0)
+
+    def getPolylines(self):
+        # Chains edges whose origin is the target of the previous edge, so a connection_list path is one line call
+        polylines = []
+        current = []
+        for origin, target in self.edges.tolist():
+            if not current or current[-1] != origin:
+                if len(current) > 1:
+                    polylines.append(current)
+                current = [origin]
+            current.append(target)
+        if len(current) > 1:
+            polylines.append(current)
+        return polylines
+
+def toColor(color: tuple):
+    return '#%02x%02x%02x' % color
+
+class PNGRenderer():
+    """Draws scenes onto one reused palette canvas.
+
+    The canvas, the font and the rendered glyphs are kept between calls, so rendering many
+    constellations of the same size only allocates the encoded PNG data.
+    """
+    def __init__(self, width: int, height: int):
+        self.width = width
+        self.height = height
+        self.canvas = Image.new('P', (width, height), background_index)
+        self.canvas.putpalette(background_color + line_color + star_color)
+        self.draw = ImageDraw.Draw(self.canvas)
+        self.font = ImageFont.load_default()
+        self.glyphs = {}
+        self.render_time = 0.0
+
+    def getGlyph(self, character: str):
+        if character not in self.glyphs:
+            left, top, right, bottom = self.font.getbbox(character)
+            mask = Image.new('1', (max(right, 1), max(bottom, 1)), 0)
+            ImageDraw.Draw(mask).text((0, 0), character, fill=1, font=self.font)
+            self.glyphs[character] = (mask, self.font.getlength(character))
+        return self.glyphs[character]
+
+    def drawText(self, x: float, y: float, text: str, color_index: int):
+        top = int(y)
+        for character in text:
+            mask, advance = self.getGlyph(character)
+            self.canvas.paste(color_index, (int(x), top), mask)
+            x += advance
+
+    def render(self, scene: Scene):
+        # Returns the shared canvas, it is only valid until the next call
+        self.canvas.paste(background_index, (0, 0, self.width, self.height))
+        for polyline in scene.getPolylines():
+            self.draw.line(list(zip(scene.x[polyline].tolist(), scene.y[polyline].tolist())), fill=line_index, width=1)
+        radii = scene.getRadii()
+        boxes = np.stack((scene.x - radii, scene.y - radii, scene.x + radii, scene.y + radii), axis=1).tolist()
+        color_indices = np.where(scene.highlighted, highlight_index, star_index).tolist()
+        for index, box in enumerate(boxes):
+            color_index = color_indices[index]
+            self.draw.ellipse(box, fill=color_index, outline=color_index)
+            self.drawText(box[2] + 1, box[3] + 1, scene.labels[index], color_index)
+        return self.canvas
+
+    def renderBytes(self, scene: Scene):
+        start = time.perf_counter()
+        output = io.BytesIO()
+        self.render(scene).save(output, 'PNG')
+        self.render_time = time.perf_counter() - start
+        return output.getvalue()
+
+class SVGRenderer():
+    """Writes scenes as SVG documents with one path for all connections."""
+    def __init__(self, width: int, height: int):
+        self.width = width
+        self.height = height
+        self.render_time = 0.0
+
+    def renderBytes(self, scene: Scene):
+        start = time.perf_counter()
+        parts = ['<svg xmlns="http://www.w3.org/2000/svg" width="%d" height="%d" viewBox="0 0 %d %d">\n' % (self.width, self.height, self.width, self.height)]
+        parts.append('<rect width="100%%" height="100%%" fill="%s"/>\n' % toColor(background_color))
+        path = []
+        for polyline in scene.getPolylines():
+            points = ['%.2f %.2f' % point for point in zip(scene.x[polyline].tolist(), scene.y[polyline].tolist())]
+            path.append('M' + ' L'.join(points))
+        if path:
+            parts.append('<path d="%s" fill="none" stroke="%s" stroke-width="1"/>\n' % (' '.join(path), toColor(line_color)))
+        radii = scene.getRadii().tolist()
+        x = scene.x.tolist()
+        y = scene.y.tolist()
+        for color, indices in ((highlight_color, np.flatnonzero(scene.highlighted).tolist()), (star_color, np.flatnonzero(~scene.highlighted).tolist())):
+            if len(indices) == 0:
+                continue
+            parts.append('<g fill="%s" font-family="sans-serif" font-size="10">\n' % toColor(color))
+            for index in indices:
+                parts.append('<circle cx="%.2f" cy="%.2f" r="%d"/><text x="%.2f" y="%.2f" dominant-baseline="hanging">%s</text>\n' % (x[index], y[index], radii[index], x[index] + radii[index] + 1, y[index] + radii[index] + 1, escape(scene.labels[index])))
+            parts.append('</g>\n')
+        parts.append('</svg>\n')
+        data = ''.join(parts).encode('utf-8')
+        self.render_time = time.perf_counter() - start
+        return data
+
+renderer_classes = {
+    'png': PNGRenderer,
+    'svg': SVGRenderer
+}
+renderers = {}
+
+def getRenderer(image_format: str, width: int, height: int):
+    # One renderer per format and size and process, so canvases and fonts are reused
+    key = (image_format, width, height)
+    if key not in renderers:
+        if image_format not in renderer_classes:
+            raise ValueError('Unknown image format: ' + image_format)
+        renderers[key] = renderer_classes[image_format](width, height)
+    return renderers[key]
+
+if __name__ == '__main__':
+    # Measures the render time for a synthetic constellation: ConstellationRenderer.py [stars] [width] [height]
+    star_count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    width = int(sys.argv[2]) if len(sys.argv) > 2 else 1920
+    height = int(sys.argv[3]) if len(sys.argv) > 3 else 1080
+    generator = np.random.default_rng(0)
+    path = np.arange(min(star_count, 25))
+    scene = Scene(generator.uniform(20, width - 20, star_count), generator.uniform(20, height - 20, star_count),
+                  np.sort(generator.uniform(-1.0, 6.5, star_count)), ['Alp,%d' % (index + 1000) for index in range(star_count)],
+                  np.stack((path[:-1], path[1:]), axis=1))
+    for image_format in renderer_classes:
+        renderer = getRenderer(image_format, width, height)
+        renderer.renderBytes(scene)
+        durations = []
+        for repetition in range(10):
+            renderer.renderBytes(scene)
+            durations.append(renderer.render_time)
+        print(image_format, star_count, 'stars', '%.2f ms' % (min(durations) * 1000))
@@ -0,0 +1,107 @@
+#!/usr/bin/python3
+
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+import numpy as np
+
+magic = b'SCEPACK1'
+alignment = 16
+
+# Columns of every constellation: per star arrays and the (origin, target) index pairs of the connections
+column_types = {
+    'x': np.float32,
+    'y': np.float32,
+    'z': np.float32,
+    'visual_magnitude': np.float32,
+    'star_id': np.int32,
+    'catalogue_number': np.int32,
+    'bayer_designation': 'S8',
+    'edges': np.int32
+}
+
+def align(offset: int):
+    return (offset + alignment - 1) // alignment * alignment
+
+def writePackedCatalogue(path: str, constellations: list):
+    """Writes all constellations into one file of aligned columns behind a JSON index.
+
+    constellations is a list of (names, arrays) pairs, names is the 'name' dict of the JSON output
+    and arrays maps every column in column_types to an array. The layout is the magic bytes, the
+    index length as little endian uint64, the index and the column data, every column starting at
+    a multiple of 16 bytes.
+    """
+    index = {'version': 1, 'constellations': {}}
+    blocks = []
+    offset = 0
+    for names, arrays in constellations:
+        columns = {}
+        for column, dtype in column_types.items():
+            data = np.ascontiguousarray(arrays[column], dtype=dtype)
+            offset = align(offset)
+            columns[column] = {'offset': offset, 'dtype': data.dtype.str, 'shape': list(data.shape)}
+            blocks.append((offset, data))
+            offset += data.nbytes
+        index['constellations'][names['latin']] = {'name': names, 'columns': columns}
+    header = json.dumps(index, separators=(',', ':')).encode('utf-8')
+    data_start = align(len(magic) + 8 + len(header))
+    temporary_path = path + '.tmp'
+    with open(temporary_path, 'wb') as outfile:
+        outfile.write(magic + struct.pack('<Q', len(header)) + header)
+        for block_offset, data in blocks:
+            outfile.write(b'\0' * (data_start + block_offset - outfile.tell()))
+            outfile.write(data.tobytes())
+    os.replace(temporary_path, path)
+
+class PackedCatalogue():
+    """Memory maps a file written by writePackedCatalogue, the returned arrays are views into the file."""
+    def __init__(self, path: str):
+        self.file = open(path, 'rb')
+        self.buffer = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.buffer[:len(magic)] != magic:
+            raise ValueError(path + ' is not a packed constellation catalogue')
+        header_length = struct.unpack_from('<Q', self.buffer, len(magic))[0]
+        header_start = len(magic) + 8
+        self.index = json.loads(self.buffer[header_start:header_start + header_length].decode('utf-8'))
+        self.data_start = align(header_start + header_length)
+
+    def getNames(self):
+        return list(self.index['constellations'])
+
+    def __contains__(self, latin_name: str):
+        return latin_name in self.index['constellations']
+
+    def getName(self, latin_name: str):
+        return self.index['constellations'][latin_name]['name']
+
+    def getConstellation(self, latin_name: str):
+        arrays = {}
+        for column, layout in self.index['constellations'][latin_name]['columns'].items():
+            arrays[column] = np.ndarray(layout['shape'], layout['dtype'], self.buffer, self.data_start + layout['offset'])
+        return arrays
+
+    def close(self):
+        # All arrays returned by getConstellation have to be released before
+        self.buffer.close()
+        self.file.close()
+
+if __name__ == '__main__':
+    # Compares the load time of all JSON files with the packed file: PackedCatalogue.py [output directory]
+    from StarConstellationExtractor import constellation_list
+    directory = sys.argv[1] if len(sys.argv) > 1 else 'output'
+    # Only the main JSON file of every constellation, not the metrics, the manifest or additional views
+    paths = [os.path.join(directory, constellation.latin_name + '.json') for constellation in constellation_list]
+    paths = [path for path in paths if os.path.exists(path)]
+    start = time.perf_counter()
+    for path in paths:
+        with open(path) as infile:
+            json.load(infile)
+    json_time = time.perf_counter() - start
+    start = time.perf_counter()
+    catalogue = PackedCatalogue(os.path.join(directory, 'constellations.pack'))
+    star_count = sum(len(catalogue.getConstellation(latin_name)['x']) for latin_name in catalogue.getNames())
+    packed_time = time.perf_counter() - start
+    print(star_count, 'stars', 'JSON: %.2f ms' % (json_time * 1000), 'packed: %.2f ms' % (packed_time * 1000))
@@ -0,0 +1,67 @@
+#!/usr/bin/python3
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+class PageFetcher():
+    """Downloads pages concurrently over a shared pool of keep-alive connections.
+
+    max_workers limits the number of downloads in flight, max_per_host limits them per host.
+    Failed requests (connection errors and 429/5xx answers) are retried with exponential backoff.
+    If a ResponseCache is given, cached pages are returned without touching the network.
+    """
+    def __init__(self, max_workers: int = 8, max_per_host: int = 4, retries: int = 3, backoff_factor: float = 0.5, timeout: float = 60.0, cache=None):
+        self.max_workers = max(1, max_workers)
+        self.max_per_host = max(1, max_per_host)
+        self.timeout = timeout
+        self.cache = cache
+        # Seconds every fetched url took, including cache lookups and retries
+        self.fetch_times = {}
+        self.session = requests.Session()
+        retry = Retry(total=retries, backoff_factor=backoff_factor, status_forcelist=(429, 500, 502, 503, 504), allowed_methods=frozenset(['GET']))
+        adapter = HTTPAdapter(pool_connections=self.max_workers, pool_maxsize=self.max_workers, max_retries=retry)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.host_semaphores = {}
+        self.host_lock = threading.Lock()
+
+    def getHostSemaphore(self, url: str):
+        host = urlsplit(url).netloc
+        with self.host_lock:
+            if host not in self.host_semaphores:
+                self.host_semaphores[host] = threading.BoundedSemaphore(self.max_per_host)
+            return self.host_semaphores[host]
+
+    def fetch(self, url: str):
+        start = time.perf_counter()
+        try:
+            return self.download(url)
+        finally:
+            self.fetch_times[url] = time.perf_counter() - start
+
+    def download(self, url: str):
+        if self.cache is not None:
+            page = self.cache.get(url)
+            if page is not None:
+                return page
+        with self.getHostSemaphore(url):
+            response = self.session.get(url, timeout=self.timeout)
+        response.raise_for_status()
+        if self.cache is not None:
+            self.cache.put(url, response.text)
+        return response.text
+
+    def fetchAll(self, items: list, url_attribute: str = 'url'):
+        # Yields (item, page) pairs for objects with an url attribute as soon as each download finishes
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(self.fetch, getattr(item, url_attribute)): item for item in items}
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,159 @@
+#!/usr/bin/python3
+
+import sys
+import time
+import numpy as np
+
+def projectOrthographic(xi, eta, zeta):
+    return xi, eta
+
+def projectGnomonic(xi, eta, zeta):
+    # Great circles become straight lines, stars 90 degrees or more from the centre can not be projected
+    with np.errstate(divide='ignore', invalid='ignore'):
+        behind = zeta <= 0
+        return np.where(behind, np.nan, xi / zeta), np.where(behind, np.nan, eta / zeta)
+
+def projectStereographic(xi, eta, zeta):
+    # Conformal, shapes of small figures are kept
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return 2 * xi / (1 + zeta), 2 * eta / (1 + zeta)
+
+# Projections of the local frame of a constellation onto a plane, 'cartesian' keeps the raw x/y of the unit vectors
+projections = {
+    'cartesian': None,
+    'orthographic': projectOrthographic,
+    'gnomonic': projectGnomonic,
+    'stereographic': projectStereographic
+}
+
+class View():
+    """One output of a constellation: a projection fitted into a canvas of width x height pixels."""
+    def __init__(self, projection: str = 'cartesian', width: int = 1920, height: int = 1080, border_size: int = 20):
+        if projection not in projections:
+            raise ValueError('Unknown projection: ' + projection)
+        self.projection = projection
+        self.width = width
+        self.height = height
+        self.border_size = border_size
+
+    def getKey(self):
+        return (self.projection, self.width, self.height, self.border_size)
+
+    def getName(self):
+        # Used in the file names of additional views
+        return '%s-%dx%d' % (self.projection, self.width, self.height)
+
+    def __eq__(self, other):
+        return isinstance(other, View) and self.getKey() == other.getKey()
+
+    def __hash__(self):
+        return hash(self.getKey())
+
+def parseView(specification: str, border_size: int = 20):
+    # 'projection' or 'projection:WIDTHxHEIGHT', the size defaults to 1920x1080
+    projection, _, size = specification.partition(':')
+    width, height = 1920, 1080
+    if size:
+        try:
+            width, height = (int(value) for value in size.lower().split('x'))
+        except ValueError:
+            raise ValueError('Views have to be PROJECTION or PROJECTION:WIDTHxHEIGHT, not ' + specification)
+    return View(projection, width, height, border_size)
+
+class ConstellationFrame():
+    """Centre and rotation of a constellation, computed once from the unit vectors of its stars.
+
+    The centre is the mean direction of the figure stars (all stars without connections). The
+    rotation turns the centre onto the view axis with north up and east to the left, like a sky
+    chart. Plane coordinates are cached per projection, so every further view only costs one
+    scale and shift of the arrays.
+    """
+    def __init__(self, x, y, z, figure=None):
+        vectors = np.stack((x, y, z), axis=1)
+        selected = vectors[figure] if figure is not None and len(figure) > 0 else vectors
+        selected = selected[np.all(np.isfinite(selected), axis=1)]
+        centre = selected.sum(axis=0) if len(selected) > 0 else np.array((1.0, 0.0, 0.0))
+        norm = np.linalg.norm(centre)
+        self.centre = centre / norm if norm > 0 else np.array((1.0, 0.0, 0.0))
+        pole = np.array((0.0, 0.0, 1.0)) if abs(self.centre[2]) < 0.999999 else np.array((1.0, 0.0, 0.0))
+        east = np.cross(pole, self.centre)
+        east /= np.linalg.norm(east)
+        north = np.cross(self.centre, east)
+        self.rotation = np.stack((east, north, self.centre))
+        self.x = x
+        self.y = y
+        self.local = vectors @ self.rotation.T
+        self.figure = figure
+        self.planes = {}
+
+    def getPlane(self, projection: str):
+        # Plane coordinates with x growing to the right (west) and y growing upwards (north)
+        if projection not in self.planes:
+            if projection == 'cartesian':
+                self.planes[projection] = (self.x, self.y)
+            else:
+                u, v = projections[projection](self.local[:, 0], self.local[:, 1], self.local[:, 2])
+                self.planes[projection] = (-u, v)
+        return self.planes[projection]
+
+    def getViewCoordinates(self, view: View):
+        """Pixel coordinates of all stars in a view, nan for stars the projection can not show (all of them without valid stars)."""
+        u, v = self.getPlane(view.projection)
+        if view.projection == 'cartesian':
+            return fitTopLeft(u, v, view)
+        # The figure is centred and fills the canvas, other stars may lie outside of it
+        fitted = self.figure if self.figure is not None and len(self.figure) > 0 else slice(None)
+        return fitCentred(u, v, u[fitted], v[fitted], view)
+
+def fitTopLeft(u, v, view: View):
+    # The original scaling: shifted into the positive quadrant, scaled uniformly and moved by the border
+    if not np.any(np.isfinite(u) & np.isfinite(v)):
+        return np.full(len(u), np.nan), np.full(len(v), np.nan)
+    x_min = np.nanmin(u)
+    x_max = np.nanmax(u)
+    y_min = np.nanmin(v)
+    y_max = np.nanmax(v)
+    x_shift = 0 - x_min
+    y_shift = 0 - y_min
+    with np.errstate(divide='ignore'):
+        x_scaling_factor = (view.width - (view.border_size * 2)) / (x_max + x_shift)
+        y_scaling_factor = (view.height - (view.border_size * 2)) / (y_max + y_shift)
+    scaling_factor = min(x_scaling_factor, y_scaling_factor)
+    # A single star (or all of them on one point) has no extent to fit
+    if not np.isfinite(scaling_factor):
+        scaling_factor = 1.0
+    return (u + x_shift) * scaling_factor + view.border_size, (v + y_shift) * scaling_factor + view.border_size
+
+def fitCentred(u, v, fitted_u, fitted_v, view: View):
+    finite = np.isfinite(fitted_u) & np.isfinite(fitted_v)
+    if not np.any(finite):
+        return np.full(len(u), np.nan), np.full(len(v), np.nan)
+    fitted_u = fitted_u[finite]
+    fitted_v = fitted_v[finite]
+    width = fitted_u.max() - fitted_u.min()
+    height = fitted_v.max() - fitted_v.min()
+    with np.errstate(divide='ignore'):
+        scaling_factor = min((view.width - 2 * view.border_size) / width, (view.height - 2 * view.border_size) / height)
+    if not np.isfinite(scaling_factor):
+        scaling_factor = 1.0
+    centre_u = (fitted_u.max() + fitted_u.min()) / 2
+    centre_v = (fitted_v.max() + fitted_v.min()) / 2
+    # Image rows grow downwards
+    return (u - centre_u) * scaling_factor + view.width / 2, (centre_v - v) * scaling_factor + view.height / 2
+
+if __name__ == '__main__':
+    # Measures frame and view times for random stars around one centre: Projection.py [stars] [views]
+    star_count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    view_count = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    generator = np.random.default_rng(0)
+    ra = np.radians(generator.uniform(70.0, 100.0, star_count))
+    dec = np.radians(generator.uniform(-15.0, 15.0, star_count))
+    x, y, z = np.cos(dec) * np.cos(ra), np.cos(dec) * np.sin(ra), np.sin(dec)
+    start = time.perf_counter()
+    frame = ConstellationFrame(x, y, z, np.arange(min(star_count, 20)))
+    print(star_count, 'stars', 'frame: %.2f ms' % ((time.perf_counter() - start) * 1000))
+    views = [View(projection, 640 * (1 + index % 6), 480 * (1 + index % 4)) for index, projection in zip(range(view_count), list(projections) * view_count)]
+    start = time.perf_counter()
+    for view in views:
+        frame.getViewCoordinates(view)
+    print(view_count, 'views', '%.2f ms per view' % ((time.perf_counter() - start) / view_count * 1000))
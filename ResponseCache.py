@@ -0,0 +1,92 @@
+#!/usr/bin/python3
+
+import gzip
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+class CacheMissError(LookupError):
+    pass
+
+def normalizeURL(url: str):
+    # Scheme and host are case insensitive, the order of the query parameters does not matter
+    parts = urlsplit(url)
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path or '/', query, ''))
+
+class ResponseCache():
+    """Stores raw responses gzip compressed on disk, one file per normalized URL.
+
+    Entries older than ttl seconds count as misses. If the cache grows beyond max_size bytes
+    the least recently used entries are deleted. In offline mode stale entries are still served,
+    there is nothing to refresh them from, and a miss raises CacheMissError.
+    """
+    def __init__(self, directory: str = 'cache', ttl: float = 30 * 24 * 3600, max_size: int = 256 * 1024 * 1024, offline: bool = False):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_size = max_size
+        self.offline = offline
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def getPath(self, url: str):
+        return os.path.join(self.directory, hashlib.sha256(normalizeURL(url).encode('utf-8')).hexdigest() + '.gz')
+
+    def get(self, url: str):
+        path = self.getPath(url)
+        try:
+            stored = os.stat(path).st_mtime
+            if self.offline or self.ttl is None or time.time() - stored <= self.ttl:
+                with gzip.open(path, 'rt', encoding='utf-8') as infile:
+                    page = infile.read()
+                # The access time marks recently used entries, the modification time stays the time of storage
+                os.utime(path, (time.time(), stored))
+                with self.lock:
+                    self.hits += 1
+                return page
+        except (OSError, EOFError):
+            pass
+        with self.lock:
+            self.misses += 1
+        if self.offline:
+            raise CacheMissError('Offline mode and no cached response for ' + url)
+        return None
+
+    def put(self, url: str, page: str):
+        path = self.getPath(url)
+        file_descriptor, temporary_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(file_descriptor, 'wb') as outfile:
+            with gzip.GzipFile(fileobj=outfile, mode='wb', mtime=0) as compressed:
+                compressed.write(page.encode('utf-8'))
+        os.replace(temporary_path, path)
+        self.evict()
+
+    def evict(self):
+        with self.lock:
+            entries = []
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith('.gz'):
+                    # Worker processes share the directory, another one may have removed or replaced the entry
+                    try:
+                        status = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    entries.append((status.st_atime, status.st_size, entry.path))
+            total_size = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total_size <= self.max_size:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total_size -= size
+
+    def getStatistics(self):
+        with self.lock:
+            return {'hits': self.hits, 'misses': self.misses}
@@ -0,0 +1,104 @@
+#!/usr/bin/python3
+
+import cProfile
+import contextlib
+import datetime
+import json
+import os
+import time
+import tracemalloc
+
+stages = ['download', 'parse', 'convert', 'dependencies', 'resolve', 'scale', 'json', 'render']
+
+class ConstellationMetrics():
+    """Wall time per stage and counters of one constellation, plain dicts so they can be sent between processes."""
+    def __init__(self, latin_name: str):
+        self.latin_name = latin_name
+        self.seconds = {}
+        self.counters = {}
+
+    @contextlib.contextmanager
+    def measure(self, stage: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[stage] = self.seconds.get(stage, 0.0) + time.perf_counter() - start
+
+    def count(self, counter: str, value: int):
+        self.counters[counter] = self.counters.get(counter, 0) + value
+
+    def toDict(self):
+        return {'seconds': self.seconds, 'counters': self.counters}
+
+class RunMetrics():
+    """Collects the metrics of all constellations and writes them as one JSON report."""
+    def __init__(self):
+        self.started = datetime.datetime.now()
+        self.start = time.perf_counter()
+        self.constellations = {}
+        self.run = {}
+
+    def getConstellation(self, latin_name: str):
+        if latin_name not in self.constellations:
+            self.constellations[latin_name] = ConstellationMetrics(latin_name)
+        return self.constellations[latin_name]
+
+    def merge(self, latin_name: str, data: dict):
+        # Adds the metrics a worker process measured for a constellation
+        metrics = self.getConstellation(latin_name)
+        for stage, seconds in data['seconds'].items():
+            metrics.seconds[stage] = metrics.seconds.get(stage, 0.0) + seconds
+        for counter, value in data['counters'].items():
+            metrics.count(counter, value)
+
+    def toDict(self):
+        constellations = {latin_name: metrics.toDict() for latin_name, metrics in self.constellations.items()}
+        totals = {stage: sum(metrics.seconds.get(stage, 0.0) for metrics in self.constellations.values()) for stage in stages}
+        counters = {}
+        for metrics in self.constellations.values():
+            for counter, value in metrics.counters.items():
+                counters[counter] = counters.get(counter, 0) + value
+        slowest = sorted(constellations, key=lambda latin_name: sum(constellations[latin_name]['seconds'].values()), reverse=True)
+        return {
+            'started': self.started.isoformat(timespec='seconds'),
+            'seconds': time.perf_counter() - self.start,
+            'run': self.run,
+            'totals': {'seconds': totals, 'counters': counters},
+            'slowest': slowest[:10],
+            'constellations': constellations
+        }
+
+    def write(self, path: str):
+        with open(path, 'w') as outfile:
+            json.dump(self.toDict(), outfile, indent=2)
+
+@contextlib.contextmanager
+def profiled(mode: str, path: str):
+    """Runs the block under cProfile ('cprofile', written to path.prof) or tracemalloc ('tracemalloc', top allocations written to path.tracemalloc.txt)."""
+    if mode is None:
+        yield
+        return
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    if mode == 'cprofile':
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            profiler.dump_stats(path + '.prof')
+    elif mode == 'tracemalloc':
+        tracemalloc.start(25)
+        try:
+            yield
+        finally:
+            snapshot = tracemalloc.take_snapshot()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            with open(path + '.tracemalloc.txt', 'w') as outfile:
+                outfile.write('Peak traced memory: %d bytes\n' % peak)
+                for statistic in snapshot.statistics('lineno')[:50]:
+                    outfile.write(str(statistic) + '\n')
+    else:
+        raise ValueError('Unknown profiler: ' + mode)
@@ -0,0 +1,136 @@
+#!/usr/bin/python3
+
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from ConstellationRenderer import Scene, getRenderer, highlighted_stars
+
+# Extra pixels around a tile in which stars and lines are still drawn, so markers and labels crossing the border are complete
+tile_margin = 100
+
+class SkyProjection():
+    """Equirectangular projection of the stars of all constellations into one sky chart.
+
+    Coordinates are normalized, x runs from right ascension 24h on the left to 0h on the right and
+    y from declination +90 at the top to -90 at the bottom. Connections crossing the 0h line are
+    split into two segments by adding copies of their end points shifted by one chart width.
+    """
+    def __init__(self, constellations: list):
+        x = []
+        y = []
+        z = []
+        visual_magnitude = []
+        labels = []
+        highlighted = []
+        edges = []
+        offset = 0
+        for constellation in constellations:
+            count = len(constellation.star_list)
+            x.append(constellation.x)
+            y.append(constellation.y)
+            z.append(constellation.z)
+            visual_magnitude.append(constellation.visual_magnitude)
+            labels.extend(constellation.getLabels())
+            highlighted.append(np.arange(count) < highlighted_stars)
+            edges.append(constellation.edges + offset)
+            offset += count
+        x = np.concatenate(x) if x else np.empty(0)
+        y = np.concatenate(y) if y else np.empty(0)
+        z = np.concatenate(z) if z else np.empty(0)
+        right_ascension = np.mod(np.arctan2(y, x), 2 * np.pi)
+        declination = np.arcsin(np.clip(z, -1.0, 1.0))
+        self.u = 1.0 - right_ascension / (2 * np.pi)
+        self.v = 0.5 - declination / np.pi
+        self.visual_magnitude = np.concatenate(visual_magnitude) if visual_magnitude else np.empty(0)
+        self.labels = labels
+        self.highlighted = np.concatenate(highlighted) if highlighted else np.empty(0, dtype=bool)
+        self.edges = np.concatenate(edges) if edges else np.empty((0, 2), dtype=np.int32)
+        self.splitWrappedEdges()
+
+    def splitWrappedEdges(self):
+        delta = self.u[self.edges[:, 1]] - self.u[self.edges[:, 0]]
+        wrapped = np.flatnonzero(np.abs(delta) > 0.5)
+        if len(wrapped) == 0:
+            return
+        origins = self.edges[wrapped, 0]
+        targets = self.edges[wrapped, 1]
+        shift = -np.sign(delta[wrapped])
+        # Copies of the targets next to the origins and of the origins next to the targets
+        ghost_start = len(self.u)
+        ghost_targets = ghost_start + np.arange(len(wrapped))
+        ghost_origins = ghost_targets + len(wrapped)
+        self.u = np.concatenate((self.u, self.u[targets] + shift, self.u[origins] - shift))
+        self.v = np.concatenate((self.v, self.v[targets], self.v[origins]))
+        self.visual_magnitude = np.concatenate((self.visual_magnitude, self.visual_magnitude[targets], self.visual_magnitude[origins]))
+        self.labels = self.labels + [''] * (2 * len(wrapped))
+        self.highlighted = np.concatenate((self.highlighted, self.highlighted[targets], self.highlighted[origins]))
+        self.edges = self.edges.copy()
+        self.edges[wrapped, 1] = ghost_targets
+        self.edges = np.concatenate((self.edges, np.stack((ghost_origins, targets), axis=1))).astype(np.int32)
+
+    def getTileScene(self, level_width: int, level_height: int, left: int, top: int, tile_size: int, labels: bool, radius_scale: float):
+        # Only the stars and connections that can reach into the tile, with coordinates relative to the tile
+        x = self.u * level_width - left
+        y = self.v * level_height - top
+        low = -tile_margin
+        high = tile_size + tile_margin
+        origin_x = x[self.edges[:, 0]]
+        origin_y = y[self.edges[:, 0]]
+        target_x = x[self.edges[:, 1]]
+        target_y = y[self.edges[:, 1]]
+        edge_mask = (np.maximum(origin_x, target_x) >= low) & (np.minimum(origin_x, target_x) <= high) & (np.maximum(origin_y, target_y) >= low) & (np.minimum(origin_y, target_y) <= high)
+        star_mask = (x >= low) & (x <= high) & (y >= low) & (y <= high)
+        star_mask[self.edges[edge_mask].ravel()] = True
+        indices = np.flatnonzero(star_mask)
+        edges = np.searchsorted(indices, self.edges[edge_mask])
+        tile_labels = [self.labels[index] for index in indices.tolist()] if labels else [''] * len(indices)
+        return Scene(x[indices], y[indices], self.visual_magnitude[indices], tile_labels, edges, self.highlighted[indices], radius_scale)
+
+def getLevelSize(tile_size: int, zoom: int):
+    # The chart has an aspect ratio of 2:1, level 0 fits into the upper half of one tile
+    width = tile_size * 2 ** zoom
+    height = width // 2
+    return width, height, 2 ** zoom, max(1, 2 ** zoom // 2)
+
+def getTilePath(directory: str, zoom: int, column: int, row: int):
+    return os.path.join(directory, str(zoom), str(column), str(row) + '.png')
+
+projection = None
+
+def setProjection(new_projection: SkyProjection):
+    global projection
+    projection = new_projection
+
+def renderTile(directory: str, tile_size: int, zoom: int, column: int, row: int, max_zoom: int):
+    # Renders one tile with the projection of this process and writes it straight to disk
+    width, height, columns, rows = getLevelSize(tile_size, zoom)
+    # Markers shrink with the chart, so the lower levels are not covered by them
+    radius_scale = 0.5 ** (max_zoom - zoom)
+    scene = projection.getTileScene(width, height, column * tile_size, row * tile_size, tile_size, zoom == max_zoom, radius_scale)
+    path = getTilePath(directory, zoom, column, row)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as outfile:
+        outfile.write(getRenderer('png', tile_size, tile_size).renderBytes(scene))
+    return path
+
+def renderAtlas(constellations: list, directory: str = 'output/atlas', tile_size: int = 512, max_zoom: int = 5, worker_count: int = 1):
+    """Renders a tile pyramid of the whole sky from constellations with unscaled unit vector coordinates.
+
+    Level zoom is 2^zoom tiles of tile_size pixels wide and half as high, the tiles are written to
+    directory/zoom/column/row.png one after another. Only one tile sized canvas exists per process,
+    so memory depends on tile_size and not on the size of the chart. Markers are halved with every
+    level above the deepest one, labels are only drawn on the deepest level.
+    """
+    tiles = []
+    for zoom in range(max_zoom + 1):
+        width, height, columns, rows = getLevelSize(tile_size, zoom)
+        for column in range(columns):
+            for row in range(rows):
+                tiles.append((directory, tile_size, zoom, column, row, max_zoom))
+    sky_projection = SkyProjection(constellations)
+    if worker_count <= 1:
+        setProjection(sky_projection)
+        return [renderTile(*tile) for tile in tiles]
+    with ProcessPoolExecutor(max_workers=worker_count, mp_context=multiprocessing.get_context('spawn'), initializer=setProjection, initargs=(sky_projection,)) as executor:
+        return list(executor.map(renderTile, *zip(*tiles), chunksize=16))
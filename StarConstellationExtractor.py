@@ -1,27 +1,214 @@
 #!/usr/bin/python3
 
+import time
+import_start = time.perf_counter()
+
+import argparse
+import hashlib
+import io
 import json
-from astropy import units as u
-from astropy.coordinates import SkyCoord
-from HTMLTableParser import HTMLTableParser
-from PIL import Image, ImageDraw
+import os
+import sys
+from urllib.parse import parse_qs, urlsplit
+import numpy as np
+from Projection import View, parseView, projections
+from RunMetrics import ConstellationMetrics, RunMetrics, profiled
+from StarRegistry import StarIndex, StarRegistry
+from TSVTableParser import TSVTableParser, getTableURL
+
+# Pillow, requests, astropy and the process pool are only imported by the stages that need them
 
 max_main_stars = 10
+max_concurrent_downloads = 8
+max_downloads_per_host = 4
+cache_directory = 'cache'
+cache_ttl = 30 * 24 * 3600
+cache_max_size = 256 * 1024 * 1024
+offline = False
+# Deep ingestion: pages of page_size rows until the whole query is read (None reads only the single page of
+# constellation_list), only stars up to magnitude_limit, or catalogue_file, a local tab-separated catalogue of all
+# constellations, instead of VizieR. The stars are streamed in chunks of chunk_size rows.
+page_size = None
+magnitude_limit = None
+catalogue_file = None
+chunk_size = 10000
+# Number of processes constellations are processed in, 1 processes everything in the main process
+worker_count = os.cpu_count() or 1
+x_target = 1920
+y_target = 1080
+border_size = 20
+# Projection of the JSON coordinates and images: 'cartesian' keeps the raw x/y of the unit vectors, 'orthographic',
+# 'gnomonic' and 'stereographic' are centred on the figure with north up
+projection = 'cartesian'
+# Additional views as 'PROJECTION:WIDTHxHEIGHT', written as <latin name>.<projection>-<width>x<height>.<extension>
+views = []
+# Files written per constellation ('json', 'png', 'svg') and 'pack' for one memory mappable file of all constellations
+outputs = ['json', 'png', 'pack']
+# Indentation of the JSON files, None writes compact JSON without any whitespace
+json_indent = 2
+output_directory = 'output'
+packed_file = 'constellations.pack'
+# Increase whenever the JSON or image output changes so the manifest invalidates all outputs
+renderer_version = 2
+manifest_file = 'manifest.json'
+# Henry Draper Catalog Numbers on the page of every constellation, for connections to stars of other constellations
+star_index_file = 'star_index.npz'
+force_rebuild = False
+# Structured metrics of the run
+metrics_file = 'metrics.json'
+# Opt-in profiling with 'cprofile' or 'tracemalloc' of the whole run or only of profile_constellation (latin name)
+profiler = None
+profile_constellation = None
+profile_directory = 'profile'
+# Renders one tiled all-sky chart instead of the constellation files
+atlas = False
+atlas_directory = 'atlas'
+atlas_tile_size = 512
+atlas_max_zoom = 5
+
+# Maximum absolute difference of the x/y/z values computed by the NumPy backend compared to
+# SkyCoord(ra, dec, unit=(u.hourangle, u.deg)) in cartesian representation (unit sphere)
+coordinate_tolerance = 1e-9
+
+def parseSexagesimal(values: list):
+    # Tokenizes "h m s" / "d m s" strings (space or colon separated), the arithmetic is done on arrays
+    fields = np.zeros((len(values), 3))
+    negative = np.zeros(len(values), dtype=bool)
+    invalid = np.zeros(len(values), dtype=bool)
+    for index, value in enumerate(values):
+        parts = str(value).replace(':', ' ').split()
+        try:
+            if not 1 <= len(parts) <= 3:
+                raise ValueError
+            fields[index, :len(parts)] = [float(part) for part in parts]
+        except ValueError:
+            invalid[index] = True
+            continue
+        negative[index] = parts[0].startswith('-')
+    fields = np.abs(fields)
+    result = fields[:, 0] + fields[:, 1] / 60.0 + fields[:, 2] / 3600.0
+    result[negative] *= -1.0
+    result[invalid] = np.nan
+    return result
+
+def skyToCartesian(right_ascensions: list, declinations: list, backend: str = 'numpy'):
+    # Converts right ascension (hours) and declination (degrees) strings to unit vectors in one batch
+    if len(right_ascensions) == 0:
+        return np.empty(0), np.empty(0), np.empty(0)
+    if backend == 'astropy':
+        try:
+            from astropy import units as u
+            from astropy.coordinates import SkyCoord
+        except ImportError:
+            raise ImportError('The astropy backend requires astropy to be installed')
+        sky_coordinates = SkyCoord(ra=right_ascensions, dec=declinations, unit=(u.hourangle, u.deg))
+        cartesian = sky_coordinates.cartesian
+        return cartesian.x.value, cartesian.y.value, cartesian.z.value
+    if backend != 'numpy':
+        raise ValueError('Unknown coordinate backend: ' + backend)
+    ra = np.radians(parseSexagesimal(right_ascensions) * 15.0)
+    dec = np.radians(parseSexagesimal(declinations))
+    cos_dec = np.cos(dec)
+    return cos_dec * np.cos(ra), cos_dec * np.sin(ra), np.sin(dec)
+
+# Constellations whose query uses a wildcard instead of their IAU abbreviation
+abbreviation_overrides = {
+    'Cygnus': 'Cyg'
+}
+
+def getAbbreviation(latin_name: str, url: str):
+    if latin_name in abbreviation_overrides:
+        return abbreviation_overrides[latin_name]
+    return parse_qs(urlsplit(url).query).get('Cst', [''])[0].strip('*')
 
 class Star():
-    def __init__(self, star_id: int, catalogue_number: int, right_ascension: str, declination: str, visual_magnitude: float, bayer_designation:str):
-        self.star_id = star_id
-        self.catalogue_number = catalogue_number
-        self.right_ascension = right_ascension
-        self.declination = declination
-        self.sky_coordinates = SkyCoord(ra=right_ascension, dec=declination, unit=(u.hourangle, u.deg))
-        self.sky_coordinates.representation_type='cartesian'
-        self.x = self.sky_coordinates.x
-        self.y = self.sky_coordinates.y
-        self.z = self.sky_coordinates.z
-        self.visual_magnitude = visual_magnitude
-        self.bayer_designation = bayer_designation
-        self.connections = []
+    """View of one star in the arrays of its constellation, for code that expects star attributes.
+
+    Right ascension and declination are only kept until the coordinates are converted. x and y are
+    the pixel coordinates in the default view, unit_x, unit_y and unit_z the unit vector; other
+    views come from Constellation.getViewCoordinates.
+    """
+    __slots__ = ('constellation', 'index')
+    
+    def __init__(self, constellation, index: int):
+        self.constellation = constellation
+        self.index = index
+    
+    @property
+    def star_id(self):
+        return int(self.constellation.star_id[self.index])
+    
+    @property
+    def catalogue_number(self):
+        return int(self.constellation.catalogue_number[self.index])
+    
+    @property
+    def visual_magnitude(self):
+        return float(self.constellation.visual_magnitude[self.index])
+    
+    @property
+    def bayer_designation(self):
+        return self.constellation.bayer_designations[self.constellation.bayer_code[self.index]]
+    
+    @property
+    def right_ascension(self):
+        return self.constellation.getPendingCoordinate(self.constellation.right_ascensions, self.index)
+    
+    @property
+    def declination(self):
+        return self.constellation.getPendingCoordinate(self.constellation.declinations, self.index)
+    
+    @property
+    def x(self):
+        return float(self.constellation.getViewCoordinates()[0][self.index])
+    
+    @property
+    def y(self):
+        return float(self.constellation.getViewCoordinates()[1][self.index])
+    
+    @property
+    def z(self):
+        return self.constellation.z[self.index]
+    
+    @property
+    def unit_x(self):
+        return self.constellation.x[self.index]
+    
+    @property
+    def unit_y(self):
+        return self.constellation.y[self.index]
+    
+    @property
+    def unit_z(self):
+        return self.constellation.z[self.index]
+    
+    @property
+    def connections(self):
+        # Star ids of the connection targets of this star
+        edges, bounds = self.constellation.getEdgesByOrigin()
+        return self.constellation.star_id[edges[bounds[self.index]:bounds[self.index + 1], 1]].tolist()
+
+class StarList():
+    """Sequence of Star views over the arrays of a constellation."""
+    __slots__ = ('constellation',)
+    
+    def __init__(self, constellation):
+        self.constellation = constellation
+    
+    def __len__(self):
+        return len(self.constellation.star_id)
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [Star(self.constellation, position) for position in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('star index out of range')
+        return Star(self.constellation, index)
+    
+    def __iter__(self):
+        return (Star(self.constellation, index) for index in range(len(self)))
 
 class Constellation():
     def __init__(self, latin_name: str, german_name: str, english_name: str, url: str, connection_list: list):
@@ -29,8 +216,67 @@ class Constellation():
         self.german_name = german_name
         self.english_name = english_name
         self.url = url
+        self.table_url = getTableURL(url)
+        self.abbreviation = getAbbreviation(latin_name, url)
         self.connection_list = connection_list
-        self.star_list = []
+        # Stars as one array per attribute, Bayer designations are stored once and referenced by their position
+        self.star_id = np.empty(0, dtype=np.int32)
+        self.catalogue_number = np.empty(0, dtype=np.int32)
+        self.visual_magnitude = np.empty(0)
+        self.bayer_code = np.empty(0, dtype=np.int16)
+        self.bayer_designations = []
+        self.bayer_codes = {}
+        self.star_list = StarList(self)
+        # Coordinate strings of the stars after the converted ones, dropped once they are converted
+        self.right_ascensions = []
+        self.declinations = []
+        # Sorted copies of the id columns for lookups, rebuilt after stars were added
+        self.lookups = {}
+        # Resolved connections as (origin index, target index) rows
+        self.edges = np.empty((0, 2), dtype=np.int32)
+        # Edges sorted by origin and the edge range of every star, rebuilt after the edges or stars changed
+        self.edges_by_origin = None
+        self.unresolved_connections = []
+        # Catalogue numbers of the stars appended from other constellations, they follow the stars of the own page
+        self.borrowed_stars = []
+        self.x = np.empty(0)
+        self.y = np.empty(0)
+        self.z = np.empty(0)
+        # Centre and rotation of the stars and the pixel coordinates of every view computed so far
+        self.frame = None
+        self.view_coordinates = {}
+        # View of getJSONData, getScene and render without a view, selected by scaleCoordinates
+        self.view = None
+    
+    def copy(self):
+        # A new constellation without stars, so the entries of constellation_list can be processed more than once
+        return Constellation(self.latin_name, self.german_name, self.english_name, self.url, self.connection_list)
+    
+    def matches(self, name: str):
+        name = name.casefold()
+        return name in (self.latin_name.casefold(), self.german_name.casefold(), self.english_name.casefold(), self.abbreviation.casefold())
+    
+    def getBayerCodes(self, bayer_designations: list):
+        codes = np.empty(len(bayer_designations), dtype=np.int16)
+        for position, bayer_designation in enumerate(bayer_designations):
+            if bayer_designation not in self.bayer_codes:
+                self.bayer_codes[bayer_designation] = len(self.bayer_designations)
+                self.bayer_designations.append(bayer_designation)
+            codes[position] = self.bayer_codes[bayer_designation]
+        return codes
+    
+    def appendStars(self, star_id, catalogue_number, visual_magnitude, bayer_designation: list, right_ascension: list = None, declination: list = None):
+        # Appends columns of new stars, either with coordinate strings or followed by their converted coordinates
+        self.star_id = np.concatenate((self.star_id, np.asarray(star_id, dtype=np.int32)))
+        self.catalogue_number = np.concatenate((self.catalogue_number, np.asarray(catalogue_number, dtype=np.int32)))
+        self.visual_magnitude = np.concatenate((self.visual_magnitude, np.asarray(visual_magnitude, dtype=np.float64)))
+        self.bayer_code = np.concatenate((self.bayer_code, self.getBayerCodes(bayer_designation)))
+        if right_ascension is not None:
+            self.right_ascensions.extend(right_ascension)
+            self.declinations.extend(declination)
+        self.lookups = {}
+        self.edges_by_origin = None
+        self.resetViews()
     
     def addStar(self, star_id: str, catalogue_number: str, right_ascension: str, declination: str, visual_magnitude: str, bayer_designation: str):
         try:
@@ -43,54 +289,230 @@ class Constellation():
             visual_magnitude = -1.0
             print('WARNING: Invalid value conversion inside constellation', self.latin_name)
         
-        new_star = Star(int(star_id), int(catalogue_number), right_ascension, declination, float(visual_magnitude), bayer_designation)
-        self.star_list.append(new_star)
-        return new_star.x, new_star.y
+        self.appendStars([star_id], [catalogue_number], [visual_magnitude], [bayer_designation], [right_ascension], [declination])
+        return self.star_list[-1]
+    
+    def addStarTable(self, table):
+        # Adds the already typed and deduplicated rows of a TSVTableParser StarTable
+        if table.conversion_failures > 0:
+            print('WARNING:', table.conversion_failures, 'invalid value conversions inside constellation', self.latin_name)
+        self.appendStars(table.star_id, table.catalogue_number, table.visual_magnitude, table.bayer_designation, table.right_ascension, table.declination)
+    
+    def getPendingCoordinate(self, coordinates: list, index: int):
+        # The coordinate string of a star that is not converted yet, None afterwards
+        position = index - (len(self.star_id) - len(coordinates))
+        return coordinates[position] if position >= 0 else None
+    
+    def convertCoordinates(self, backend: str = 'numpy'):
+        # Converts the stars added since the last conversion, so stars can be added and converted chunk by chunk
+        start = len(self.x)
+        x, y, z = skyToCartesian(self.right_ascensions, self.declinations, backend)
+        self.x = np.concatenate((self.x, x))
+        self.y = np.concatenate((self.y, y))
+        self.z = np.concatenate((self.z, z))
+        self.right_ascensions = []
+        self.declinations = []
+        self.resetViews()
+        self.warnInvalidCoordinates(start)
+    
+    def setCoordinates(self, x, y, z):
+        self.x = np.asarray(x, dtype=np.float64)
+        self.y = np.asarray(y, dtype=np.float64)
+        self.z = np.asarray(z, dtype=np.float64)
+        self.right_ascensions = []
+        self.declinations = []
+        self.resetViews()
+        self.warnInvalidCoordinates(0)
+    
+    def warnInvalidCoordinates(self, start: int):
+        for index in start + np.flatnonzero(np.isnan(self.x[start:])):
+            print('WARNING: Invalid coordinates inside constellation', self.latin_name, 'for star id:', self.star_id[index])
+    
+    def borrowStars(self, stars: dict):
+        # Appends already converted stars of other constellations (StarRegistry columns), so connection_list can reach them
+        new = np.flatnonzero(self.findStars('catalogue_number', stars['catalogue_number']) < 0)
+        # Star ids are row numbers of the own page, borrowed stars get new ones so the JSON connections stay unique
+        next_star_id = int(np.max(self.star_id, initial=0)) + 1
+        self.appendStars(np.arange(next_star_id, next_star_id + len(new)), np.asarray(stars['catalogue_number'])[new],
+                         np.asarray(stars['visual_magnitude'])[new], [str(designation) for designation in np.asarray(stars['bayer_designation'])[new]])
+        self.x = np.concatenate((self.x, np.asarray(stars['x'])[new]))
+        self.y = np.concatenate((self.y, np.asarray(stars['y'])[new]))
+        self.z = np.concatenate((self.z, np.asarray(stars['z'])[new]))
+        self.resetViews()
+        self.borrowed_stars.extend(np.asarray(stars['catalogue_number'])[new].tolist())
+    
+    def findStars(self, column: str, values):
+        # Index of the first star with each value in the star_id or catalogue_number column, -1 if there is none
+        if column not in self.lookups:
+            order = np.argsort(getattr(self, column), kind='stable').astype(np.int32)
+            self.lookups[column] = (order, getattr(self, column)[order])
+        order, sorted_values = self.lookups[column]
+        values = np.asarray(values, dtype=np.int64).reshape(-1)
+        if len(order) == 0:
+            return np.full(len(values), -1)
+        positions = np.minimum(np.searchsorted(sorted_values, values), len(order) - 1)
+        return np.where(sorted_values[positions] == values, order[positions], -1)
     
     def getStarByStarID(self, star_id: int):
-        for star in self.star_list:
-            if star.star_id == star_id:
-                return star
-        print("WARNING: Could not find star id:", star_id)
-        return None
+        index = int(self.findStars('star_id', star_id)[0])
+        if index < 0:
+            print("WARNING: Could not find star id:", star_id)
+            return None
+        return self.star_list[index]
     
     def getStarByCatalogueNumber(self, catalogue_number: int):
-        for star in self.star_list:
-            if star.catalogue_number == catalogue_number:
-                return star
-        print("WARNING: Could not find catalogue number:", catalogue_number)
-        return None
-    
-    def drawPNG(self):
-        img = Image.new('RGB', (1920, 1080), color = (255, 255, 255))
-        draw = ImageDraw.Draw(img)
-        
-        count = 0
-        for star in self.star_list:
-            color_code = (255, 255, 0)
-            if count < 15:
-                color_code = (0, 0, 0)
-            count += 1
-            
-            radius = int(round(10.0 - star.visual_magnitude, 2))
-            x0 = star.x - radius
-            x1 = star.x + radius
-            y0 = star.y - radius
-            y1 = star.y + radius
-            draw.ellipse([(x0, y0), (x1, y1)], fill=color_code, outline=color_code)
-            draw.text((x1+1,y1+1), star.bayer_designation + "," + str(star.catalogue_number), fill=color_code)
-            
-            for connection_id in star.connections:
-                target_star = self.getStarByStarID(connection_id)
-                draw.line([(star.x, star.y), (target_star.x, target_star.y)], fill =(0, 0, 0), width = 0)
-        
-        img.save('output/' + self.latin_name + '.png')
+        index = int(self.findStars('catalogue_number', catalogue_number)[0])
+        if index < 0:
+            print("WARNING: Could not find catalogue number:", catalogue_number)
+            return None
+        return self.star_list[index]
+    
+    def resolveConnections(self):
+        # Maps Henry Draper Catalog Numbers of connections to star indices once, unknown numbers are collected
+        self.unresolved_connections = []
+        self.edges_by_origin = None
+        # The frame is centred on the figure
+        self.resetViews()
+        if len(self.connection_list) < 2:
+            self.edges = np.empty((0, 2), dtype=np.int32)
+            return
+        indices = self.findStars('catalogue_number', self.connection_list)
+        resolved = (indices[:-1] >= 0) & (indices[1:] >= 0)
+        self.edges = np.stack((indices[:-1][resolved], indices[1:][resolved]), axis=1).astype(np.int32)
+        for position in np.flatnonzero(indices < 0).tolist():
+            if self.connection_list[position] not in self.unresolved_connections:
+                self.unresolved_connections.append(self.connection_list[position])
+        if self.unresolved_connections:
+            print('WARNING: Could not resolve catalogue numbers inside constellation', self.latin_name, self.unresolved_connections)
+    
+    def getEdgesByOrigin(self):
+        # Edges sorted by origin index (keeping the connection order) and the edge range of every star
+        if self.edges_by_origin is None:
+            edges = self.edges[np.argsort(self.edges[:, 0], kind='stable')]
+            bounds = np.searchsorted(edges[:, 0], np.arange(len(self.star_id) + 1))
+            self.edges_by_origin = (edges, bounds)
+        return self.edges_by_origin
+    
+    def getStarBytes(self):
+        # Memory of the star arrays and the distinct Bayer designations
+        columns = (self.star_id, self.catalogue_number, self.visual_magnitude, self.bayer_code, self.x, self.y, self.z)
+        return sum(column.nbytes for column in columns) + sum(sys.getsizeof(designation) for designation in self.bayer_designations)
+    
+    def resetViews(self):
+        self.frame = None
+        self.view_coordinates = {}
+    
+    def getFrame(self):
+        # Centre and rotation of the constellation, computed once for all views from the unit vectors
+        if self.frame is None:
+            from Projection import ConstellationFrame
+            self.frame = ConstellationFrame(self.x, self.y, self.z, np.unique(self.edges))
+        return self.frame
+    
+    def getViewCoordinates(self, view: View = None):
+        # Pixel x and y of all stars in a view, by default the one selected by scaleCoordinates
+        if view is None:
+            view = self.view or View(projection, x_target, y_target, border_size)
+        if view not in self.view_coordinates:
+            self.view_coordinates[view] = self.getFrame().getViewCoordinates(view)
+        return self.view_coordinates[view]
+    
+    def scaleCoordinates(self, x_target: int, y_target: int, border_size: int, projection: str = 'cartesian'):
+        # Selects the default view and computes its coordinates, the unit vectors are kept for further views
+        self.view = View(projection, x_target, y_target, border_size)
+        self.getViewCoordinates(self.view)
+    
+    def getJSONData(self, view: View = None):
+        x, y = self.getViewCoordinates(view)
+        data = {}
+        data['name'] = {
+            'latin': self.latin_name,
+            'german': self.german_name,
+            'english': self.english_name
+        }
+        data['stars'] = []
+        edges, bounds = self.getEdgesByOrigin()
+        star_ids = self.star_id.tolist()
+        targets = self.star_id[edges[:, 1]].tolist()
+        bounds = bounds.tolist()
+        for index, (star_id, x, y, z, visual_magnitude, bayer_code) in enumerate(zip(star_ids, getJSONValues(x), getJSONValues(y), getJSONValues(self.z), getJSONValues(self.visual_magnitude), self.bayer_code.tolist())):
+            connections = targets[bounds[index]:bounds[index + 1]]
+            main_star = False
+            if len(connections) > 0:
+                main_star = True
+            data['stars'].append({
+                'id': star_id,
+                'x': x,
+                'y': y,
+                'z': z,
+                'visualMagnitude': visual_magnitude,
+                'bayerDesignation': self.bayer_designations[bayer_code],
+                "mainStar": main_star,
+                "connection": connections
+            })
+        return data
+    
+    def getStarArrays(self):
+        # Stars of the own page with their unit vectors, the columns of a StarRegistry
+        count = len(self.star_id) - len(self.borrowed_stars)
+        return {
+            'catalogue_number': self.catalogue_number[:count],
+            'star_id': self.star_id[:count],
+            'x': self.x[:count],
+            'y': self.y[:count],
+            'z': self.z[:count],
+            'visual_magnitude': self.visual_magnitude[:count],
+            'bayer_designation': np.array(self.bayer_designations, dtype=str)[self.bayer_code[:count]]
+        }
+    
+    def getArrays(self, view: View = None):
+        # Columns of the packed output, x and y are the coordinates of the view like in the JSON output
+        x, y = self.getViewCoordinates(view)
+        return {
+            'x': x,
+            'y': y,
+            'z': self.z,
+            'visual_magnitude': self.visual_magnitude,
+            'star_id': self.star_id,
+            'catalogue_number': self.catalogue_number,
+            'bayer_designation': np.array([designation.encode('utf-8')[:8] for designation in self.bayer_designations], dtype='S8')[self.bayer_code],
+            'edges': self.edges
+        }
+    
+    def getScene(self, view: View = None):
+        from ConstellationRenderer import Scene, highlighted_stars
+        x, y = self.getViewCoordinates(view)
+        visible = np.isfinite(x) & np.isfinite(y)
+        if np.all(visible):
+            return Scene(x, y, self.visual_magnitude, self.getLabels(), self.edges)
+        # Stars a projection can not show (and invalid coordinates) are left out with their connections
+        positions = np.cumsum(visible) - 1
+        edges = positions[self.edges[visible[self.edges[:, 0]] & visible[self.edges[:, 1]]]]
+        labels = [label for label, shown in zip(self.getLabels(), visible.tolist()) if shown]
+        highlighted = (np.arange(len(x)) < highlighted_stars)[visible]
+        return Scene(x[visible], y[visible], self.visual_magnitude[visible], labels, edges, highlighted)
+    
+    def getLabels(self):
+        return [self.bayer_designations[bayer_code] + "," + str(catalogue_number) for bayer_code, catalogue_number in zip(self.bayer_code.tolist(), self.catalogue_number.tolist())]
+    
+    def render(self, image_format: str = 'png', width: int = 1920, height: int = 1080, view: View = None):
+        # Without view the default view is drawn onto a canvas of width x height
+        from ConstellationRenderer import getRenderer
+        if view is not None:
+            width, height = view.width, view.height
+        return getRenderer(image_format, width, height).renderBytes(self.getScene(view))
+    
+    def drawPNG(self, view: View = None):
+        view = view or self.view or View(projection, x_target, y_target, border_size)
+        with open('output/' + self.latin_name + '.png', 'wb') as outfile:
+            outfile.write(self.render('png', view=view))
     
     def print(self):
         print(self.latin_name, self.german_name, self.english_name)
         print('ID', 'X', 'Y', 'Visual magnitude', 'Bayer Designation', 'Connections')
+        x, y = self.getViewCoordinates()
         for star in self.star_list:
-            print(star.star_id, star.x, star.y, star.visual_magnitude, star.bayer_designation, star.connections)
+            print(star.star_id, x[star.index], y[star.index], star.visual_magnitude, star.bayer_designation, star.connections)
 
 constellation_list = [
     Constellation('Andromeda', 'Andromeda', 'Andromeda',
@@ -359,95 +781,673 @@ constellation_list = [
     [180554, 183439, 187811, 189849, 192806])   # The map does not show any star identifiers, I might have gotten some of them wrong
 ]
 
-for constellation in constellation_list:
-    
-    ## Download and parse constellation
-    hp = HTMLTableParser()
-    table = hp.parse_url(constellation.url)[8]
-    x_min = 10000.0
-    x_max = -10000.0
-    y_min = 10000.0
-    y_max = -10000.0
-    last_catalogue_number = ''
-    for index, row in table.iterrows():
-        star_id = row[' Full\n ']
-        catalogue_number = row['HD\n ']
-        right_ascension = row['RAJ2000\n"h:m:s" ']
-        declination = row['DEJ2000\n"d:m:s" ']
-        visual_magnitude = row['Vmag\nmag ']
-        bayer_designation = row['Bayer\n ']
-        # Removes doubles
-        if last_catalogue_number != catalogue_number:
-            x, y = constellation.addStar(star_id, catalogue_number, right_ascension, declination, visual_magnitude, bayer_designation)
-            last_catalogue_number = catalogue_number
-        if x < x_min:
-            x_min = x
-        if x > x_max:
-            x_max = x
-        if y < y_min:
-            y_min = y
-        if y > y_max:
-            y_max = y
-    
-    ## Scale cartesian coordinate system
-    x_target = 1920
-    y_target = 1080
-    border_size = 20
-
-    # Shift coordinates into positive cartesian system
-    x_shift = 0 - x_min
-    y_shift = 0 - y_min
-    
-    # Calculate best scaling factor
-    x_scaling_factor = (x_target - (border_size * 2)) / (x_max + x_shift)
-    y_scaling_factor = (y_target - (border_size * 2)) / (y_max + y_shift)
-    scaling_factor = 0
-    if x_scaling_factor < y_scaling_factor:
-        scaling_factor = x_scaling_factor
-    else:
-        scaling_factor = y_scaling_factor
+class ExtractorOptions():
+    """Settings of one run, every setting defaults to the module level setting of the same name.
+
+    The options are handed to the worker processes, which only see the module level defaults.
+    """
+    def __init__(self, **settings):
+        self.outputs = list(outputs)
+        self.x_target = x_target
+        self.y_target = y_target
+        self.border_size = border_size
+        self.projection = projection
+        self.views = list(views)
+        self.json_indent = json_indent
+        self.worker_count = worker_count
+        self.offline = offline
+        self.page_size = page_size
+        self.magnitude_limit = magnitude_limit
+        self.catalogue_file = catalogue_file
+        self.chunk_size = chunk_size
+        self.force_rebuild = force_rebuild
+        self.output_directory = output_directory
+        self.profiler = profiler
+        self.profile_constellation = profile_constellation
+        for name, value in settings.items():
+            if not hasattr(self, name):
+                raise TypeError('Unknown option: ' + name)
+            setattr(self, name, value)
+        unknown_outputs = set(self.outputs) - {'json', 'png', 'svg', 'pack'}
+        if unknown_outputs:
+            raise ValueError('Unknown outputs: ' + ', '.join(sorted(unknown_outputs)))
+        # Raises ValueError for unknown projections and malformed views
+        self.getViews()
+    
+    def isStreaming(self):
+        # Deep ingestion streams the stars from their source inside the process that handles the constellation
+        return self.page_size is not None or self.magnitude_limit is not None or self.catalogue_file is not None
+    
+    def getViews(self):
+        # The main view of the canvas size followed by the additional views
+        return [View(self.projection, self.x_target, self.y_target, self.border_size)] + [parseView(view, self.border_size) for view in self.views]
+    
+    def getImageFormats(self):
+        return [output for output in self.outputs if output in ('png', 'svg')]
     
-    # Update coordinates for all stars
-    for star in constellation.star_list:
-        star.x = (star.x + x_shift) * scaling_factor + border_size
-        star.y = (star.y + y_shift) * scaling_factor + border_size
+    def getFileExtensions(self):
+        # Additional views are written as <latin name>.<view name>.<extension>
+        extensions = [output for output in self.outputs if output != 'pack']
+        return extensions + [view.getName() + '.' + extension for view in self.getViews()[1:] for extension in extensions]
     
-    ## Resolve star connections
-    # Map Henry Draper Catalog Numbers of connections to star ids
-    for index in range(len(constellation.connection_list) - 1):
-        origin_star = constellation.getStarByCatalogueNumber(constellation.connection_list[index])
-        target_star = constellation.getStarByCatalogueNumber(constellation.connection_list[index + 1])
-        origin_star.connections.append(target_star.star_id)
+    def getPath(self, file_name: str):
+        return os.path.join(self.output_directory, file_name)
+
+class ConstellationResult():
+    """Everything the main process needs from a processed constellation, small enough to be pickled cheaply."""
+    def __init__(self, latin_name: str, json_text: str, images: dict, unresolved_connections: list, names: dict, arrays: dict, metrics: dict, stars: dict = None, borrowed_stars: list = None, fingerprint: str = None, views: dict = None, dependencies: list = None):
+        self.latin_name = latin_name
+        # Only set for streamed constellations, whose fingerprint is computed while reading their source
+        self.fingerprint = fingerprint
+        self.names = names
+        self.arrays = arrays
+        # Stars of the own page with their unit vectors, the catalogue numbers taken from other constellations and their latin names
+        self.stars = stars
+        self.borrowed_stars = borrowed_stars or []
+        self.dependencies = dependencies or []
+        self.json_text = json_text
+        self.images = images
+        # JSON text and images of the additional views by view name
+        self.views = views or {}
+        self.unresolved_connections = unresolved_connections
+        self.metrics = metrics
+
+class DeferredConstellation():
+    """A loaded constellation whose unresolved connections may be on pages that are not indexed yet.
+
+    It is returned instead of a ConstellationResult and rendered by finishConstellation once the
+    StarIndex knows the pages of all processed constellations.
+    """
+    def __init__(self, constellation: Constellation, metrics: ConstellationMetrics, dependencies: list, source_hash: str = None, dependency_hashes: dict = None):
+        self.latin_name = constellation.latin_name
+        self.constellation = constellation
+        self.metrics = metrics
+        self.stars = constellation.getStarArrays()
+        self.unresolved_connections = constellation.unresolved_connections
+        self.dependencies = dependencies
+        # Only set for streamed constellations
+        self.source_hash = source_hash
+        self.dependency_hashes = dependency_hashes or {}
+
+def selectConstellations(names: list = None):
+    # Entries of constellation_list by latin, german or english name or abbreviation, all of them without names
+    if not names:
+        return list(constellation_list)
+    selected = []
+    for name in names:
+        matches = [constellation for constellation in constellation_list if constellation.matches(name)]
+        if not matches:
+            raise ValueError('Unknown constellation: ' + name)
+        for constellation in matches:
+            if constellation not in selected:
+                selected.append(constellation)
+    # Keeps the order of constellation_list
+    return [constellation for constellation in constellation_list if constellation in selected]
+
+def getTemplate(latin_name: str):
+    return next(constellation for constellation in constellation_list if constellation.latin_name == latin_name)
+
+def getJSONValues(values):
+    # json.dumps writes nan as NaN, which is no valid JSON: invalid coordinates and stars a projection can not show become null
+    finite = np.isfinite(values)
+    if np.all(finite):
+        return values.tolist()
+    return [value if valid else None for value, valid in zip(values.tolist(), finite.tolist())]
+
+def formatJSON(data: dict, indent: int = 2):
+    if indent is None:
+        return json.dumps(data, separators=(',', ':'))
+    return json.dumps(data, indent=indent)
+
+def readStars(constellation: Constellation, page, metrics: ConstellationMetrics = None):
+    # Parses and converts page (the text of one page or an iterable of StarTables like iterStarTables) chunk by chunk
+    if metrics is None:
+        metrics = ConstellationMetrics(constellation.latin_name)
+    tables = iter(TSVTableParser().parseChunks(io.StringIO(page)) if isinstance(page, str) else page)
+    while True:
+        ## Parse the next chunk of the constellation, doubles are removed by the parser
+        with metrics.measure('parse'):
+            table = next(tables, None)
+            if table is not None:
+                constellation.addStarTable(table)
+        if table is None:
+            break
+        metrics.count('rows', table.rows)
+        metrics.count('duplicates', table.duplicates)
+        metrics.count('conversion_failures', table.conversion_failures)
+        
+        ## Convert the coordinates of the chunk in one batch
+        with metrics.measure('convert'):
+            constellation.convertCoordinates()
+    metrics.count('conversion_failures', int(np.count_nonzero(np.isnan(constellation.x))))
+
+def countStars(constellation: Constellation, metrics: ConstellationMetrics):
+    # Counters of the resolved constellation, set again if stars are borrowed later
+    metrics.counters['borrowed_stars'] = len(constellation.borrowed_stars)
+    metrics.counters['stars'] = len(constellation.star_list)
+    metrics.counters['star_bytes'] = constellation.getStarBytes()
+    metrics.counters['unresolved_connections'] = len(constellation.unresolved_connections)
+
+def loadConstellation(constellation: Constellation, page, metrics: ConstellationMetrics = None, borrowed_stars: dict = None):
+    # page is the text of one page or an iterable of StarTables like iterStarTables
+    if metrics is None:
+        metrics = ConstellationMetrics(constellation.latin_name)
+    readStars(constellation, page, metrics)
+    
+    ## Resolve star connections, borrowed stars of other constellations are StarRegistry columns
+    with metrics.measure('resolve'):
+        if borrowed_stars is not None:
+            constellation.borrowStars(borrowed_stars)
+        constellation.resolveConnections()
+    countStars(constellation, metrics)
+
+# Fetcher or bulk catalogue of this process, reused for all streamed constellations
+sources = {}
+
+def getSource(options: ExtractorOptions):
+    if options.catalogue_file is not None:
+        if options.catalogue_file not in sources:
+            from CatalogueSource import BulkCatalogue
+            sources[options.catalogue_file] = BulkCatalogue(options.catalogue_file)
+        return sources[options.catalogue_file]
+    if 'fetcher' not in sources:
+        sources['fetcher'] = createFetcher(options)
+    return sources['fetcher']
+
+def iterStarTables(constellation: Constellation, options: ExtractorOptions, fingerprint=None, urls: list = None):
+    # StarTables of at most options.chunk_size stars from the bulk catalogue or the VizieR pages of a constellation,
+    # the urls of downloaded pages are appended to urls
+    if options.catalogue_file is not None:
+        return getSource(options).iterTables(constellation.abbreviation, options.chunk_size, options.magnitude_limit, fingerprint)
+    from CatalogueSource import iterPageTables
+    cache, fetcher = getSource(options)
+    return iterPageTables(fetcher, constellation.table_url, options.page_size, options.chunk_size, options.magnitude_limit, fingerprint, urls)
+
+def getSourceHash(constellation: Constellation, options: ExtractorOptions):
+    # Reads the source of a streamed constellation once without keeping any star
+    source_fingerprint = hashlib.sha256()
+    for table in iterStarTables(constellation, options, source_fingerprint):
+        pass
+    return source_fingerprint.hexdigest()
+
+def getSourceFingerprint(constellation: Constellation, dependencies: list, options: ExtractorOptions, metrics: ConstellationMetrics):
+    # The fingerprint of a streamed constellation and the constellations it borrows stars from, without loading them
+    with metrics.measure('download'):
+        dependency_hashes = {latin_name: getSourceHash(getTemplate(latin_name), options) for latin_name in dependencies}
+        return getFingerprint(constellation, getSourceHash(constellation, options), options, dependency_hashes)
+
+def loadStreamedConstellation(constellation: Constellation, options: ExtractorOptions, metrics: ConstellationMetrics, borrowed_stars: dict = None):
+    # Streams the stars from the source of options and returns the hash of the source
+    cache = getSource(options)[0] if options.catalogue_file is None else None
+    cache_statistics = cache.getStatistics() if cache is not None else {}
+    source_fingerprint = hashlib.sha256()
+    urls = []
+    loadConstellation(constellation, iterStarTables(constellation, options, source_fingerprint, urls), metrics, borrowed_stars)
+    if urls:
+        # The pages are downloaded while the parser asks for the next chunk, their fetch time is download and not parse time
+        fetch_times = getSource(options)[1].fetch_times
+        download = sum(fetch_times[url] for url in urls)
+        metrics.seconds['download'] = metrics.seconds.get('download', 0.0) + download
+        metrics.seconds['parse'] = max(metrics.seconds['parse'] - download, 0.0)
+    for counter, value in (cache.getStatistics().items() if cache is not None else ()):
+        metrics.count('cache_' + counter, value - cache_statistics[counter])
+    return source_fingerprint.hexdigest()
+
+def loadDependencies(constellation: Constellation, dependencies: list, options: ExtractorOptions, pages: dict = None):
+    """Stars of connection_list on the pages of the constellations named in dependencies, as StarRegistry columns.
+
+    The pages are taken from pages by latin name or streamed from the source of options, one
+    constellation at a time. Returns the columns (None without dependencies) and the hash of every
+    streamed source by latin name.
+    """
+    parts = []
+    dependency_hashes = {}
+    for latin_name in dependencies:
+        owner = getTemplate(latin_name).copy()
+        if pages is not None and latin_name in pages:
+            readStars(owner, pages[latin_name])
+        else:
+            source_fingerprint = hashlib.sha256()
+            readStars(owner, iterStarTables(owner, options, source_fingerprint))
+            dependency_hashes[latin_name] = source_fingerprint.hexdigest()
+        stars = owner.getStarArrays()
+        wanted = np.isin(stars['catalogue_number'], constellation.connection_list)
+        parts.append({column: values[wanted] for column, values in stars.items()})
+    if not parts:
+        return None, dependency_hashes
+    return {column: np.concatenate([part[column] for part in parts]) for column in parts[0]}, dependency_hashes
+
+def processConstellation(constellation: Constellation, page: str, options: ExtractorOptions, dependencies: list = (), dependency_pages: dict = None, previous_fingerprint: str = None, defer: bool = False):
+    """Loads, projects and renders one constellation.
+
+    Without page the stars are streamed from the source of options; if the sources are unchanged since
+    previous_fingerprint, None is returned. dependencies names the constellations whose pages hold stars
+    of connection_list, their pages are taken from dependency_pages or streamed. With defer a constellation
+    with unresolved connections is returned as DeferredConstellation before it is rendered.
+    """
+    profile_mode = options.profiler if options.profile_constellation == constellation.latin_name else None
+    with profiled(profile_mode, os.path.join(options.getPath(profile_directory), constellation.latin_name)):
+        metrics = ConstellationMetrics(constellation.latin_name)
+        if page is None and previous_fingerprint is not None and getSourceFingerprint(constellation, dependencies, options, metrics) == previous_fingerprint:
+            return None
+        with metrics.measure('dependencies'):
+            borrowed_stars, dependency_hashes = loadDependencies(constellation, dependencies, options, dependency_pages)
+        source_hash = None
+        if page is None:
+            source_hash = loadStreamedConstellation(constellation, options, metrics, borrowed_stars)
+        else:
+            loadConstellation(constellation, page, metrics, borrowed_stars)
+        if defer and constellation.unresolved_connections:
+            return DeferredConstellation(constellation, metrics, list(dependencies), source_hash, dependency_hashes)
+        fingerprint = getFingerprint(constellation, source_hash, options, dependency_hashes) if source_hash is not None else None
+        return renderConstellation(constellation, options, metrics, fingerprint, dependencies)
+
+def finishConstellation(deferred, dependencies: list, options: ExtractorOptions, pages: dict = None):
+    # Borrows the stars of the constellations found for the unresolved connections of a DeferredConstellation and renders it
+    constellation = deferred.constellation
+    metrics = deferred.metrics
+    with metrics.measure('dependencies'):
+        borrowed_stars, dependency_hashes = loadDependencies(constellation, dependencies, options, pages)
+    with metrics.measure('resolve'):
+        if borrowed_stars is not None:
+            constellation.borrowStars(borrowed_stars)
+        constellation.resolveConnections()
+    countStars(constellation, metrics)
+    dependency_hashes.update(deferred.dependency_hashes)
+    fingerprint = getFingerprint(constellation, deferred.source_hash, options, dependency_hashes) if deferred.source_hash is not None else None
+    return renderConstellation(constellation, options, metrics, fingerprint, deferred.dependencies + dependencies)
+
+def renderConstellation(constellation: Constellation, options: ExtractorOptions, metrics: ConstellationMetrics, fingerprint: str = None, dependencies: list = ()):
+    stars = constellation.getStarArrays()
+    
+    ## Project the unit vectors into every view, the frame of the constellation is computed once
+    selected_views = options.getViews()
+    with metrics.measure('scale'):
+        for view in selected_views:
+            constellation.getViewCoordinates(view)
+    metrics.count('views', len(selected_views))
     
     ## Print constellation
     # constellation.print()
     
-    ## Write constellation to JSON
-    data = {}
-    data['name'] = {
-        'latin': constellation.latin_name,
-        'german': constellation.german_name,
-        'english': constellation.english_name
+    ## Render JSON and images of every view, the main process writes them
+    view_outputs = []
+    for view in selected_views:
+        with metrics.measure('json'):
+            data = constellation.getJSONData(view)
+            json_text = formatJSON(data, options.json_indent) if 'json' in options.outputs else None
+        images = {}
+        x, y = constellation.getViewCoordinates(view)
+        if not np.any(np.isfinite(x) & np.isfinite(y)):
+            # Nothing to draw, like with a magnitude limit brighter than every star
+            print('WARNING: No stars to draw inside constellation', constellation.latin_name)
+        elif options.getImageFormats():
+            from ConstellationRenderer import getRenderer
+            with metrics.measure('render'):
+                scene = constellation.getScene(view)
+                for image_format in options.getImageFormats():
+                    images[image_format] = getRenderer(image_format, view.width, view.height).renderBytes(scene)
+        view_outputs.append((view.getName(), (json_text, images)))
+    json_text, images = view_outputs[0][1]
+    return ConstellationResult(constellation.latin_name, json_text, images, constellation.unresolved_connections, data['name'], constellation.getArrays(selected_views[0]), metrics.toDict(), stars,
+                               constellation.borrowed_stars, fingerprint, dict(view_outputs[1:]), list(dependencies))
+
+def getFingerprint(constellation: Constellation, page: str, options: ExtractorOptions, dependency_pages: dict = None):
+    # Covers everything the output of a constellation depends on, including the pages (or source hashes) of the constellations it borrows stars from
+    settings = [constellation.latin_name, constellation.german_name, constellation.english_name, constellation.connection_list, options.x_target, options.y_target, options.border_size, options.projection, options.getFileExtensions(), options.json_indent, renderer_version]
+    if options.isStreaming():
+        # page is the hash of the streamed source then
+        settings.append([options.page_size, options.magnitude_limit, options.catalogue_file is not None])
+    settings = json.dumps(settings)
+    fingerprint = hashlib.sha256(settings.encode('utf-8'))
+    fingerprint.update(page.encode('utf-8'))
+    for latin_name, dependency_page in sorted((dependency_pages or {}).items()):
+        fingerprint.update(latin_name.encode('utf-8'))
+        fingerprint.update(dependency_page.encode('utf-8'))
+    return fingerprint.hexdigest()
+
+def getIndexSettings(options: ExtractorOptions):
+    # The pages of a StarIndex depend on the source of the stars
+    return json.dumps([options.page_size, options.magnitude_limit, options.catalogue_file])
+
+def indexConstellations(constellations: list, index: StarIndex, options: ExtractorOptions, fetcher=None):
+    # Adds the catalogue numbers on the pages of constellations to index, without converting or keeping their stars
+    if options.catalogue_file is not None:
+        for constellation in constellations:
+            index.setStars(constellation.latin_name, getSource(options).getCatalogueNumbers(constellation.abbreviation, options.magnitude_limit))
+        return
+    if options.isStreaming():
+        pages = ((constellation, iterStarTables(constellation, options)) for constellation in constellations)
+    else:
+        pages = ((constellation, TSVTableParser().parseChunks(io.StringIO(page))) for constellation, page in fetcher.fetchAll(constellations, 'table_url'))
+    for constellation, tables in pages:
+        index.setStars(constellation.latin_name, [catalogue_number for table in tables for catalogue_number in table.catalogue_number])
+
+def loadManifest(path: str):
+    try:
+        with open(path) as infile:
+            return json.load(infile)
+    except (OSError, ValueError):
+        return {}
+
+def saveManifest(path: str, manifest: dict):
+    with open(path + '.tmp', 'w') as outfile:
+        json.dump(manifest, outfile, indent=2, sort_keys=True)
+    os.replace(path + '.tmp', path)
+
+def loadPackedCatalogue(path: str):
+    # Arrays of the previous packed output, so skipped constellations can be packed again
+    from PackedCatalogue import PackedCatalogue
+    try:
+        catalogue = PackedCatalogue(path)
+    except (OSError, ValueError):
+        return {}
+    packed = {}
+    for latin_name in catalogue.getNames():
+        arrays = {column: np.array(data) for column, data in catalogue.getConstellation(latin_name).items()}
+        packed[latin_name] = (catalogue.getName(latin_name), arrays)
+    catalogue.close()
+    return packed
+
+def isUpToDate(manifest: dict, packed: dict, constellation: Constellation, fingerprint: str, options: ExtractorOptions):
+    if options.force_rebuild or manifest.get(constellation.latin_name) != fingerprint:
+        return False
+    if 'pack' in options.outputs and constellation.latin_name not in packed:
+        return False
+    return all(os.path.exists(options.getPath(constellation.latin_name + '.' + extension)) for extension in options.getFileExtensions())
+
+def writeResult(result: ConstellationResult, options: ExtractorOptions):
+    for file_name, (json_text, images) in [(result.latin_name, (result.json_text, result.images))] + [(result.latin_name + '.' + name, view) for name, view in result.views.items()]:
+        if json_text is not None:
+            with open(options.getPath(file_name + '.json'), 'w') as outfile:
+                outfile.write(json_text)
+        for image_format in options.getImageFormats():
+            if image_format not in images:
+                # Images of earlier runs would show stars that are gone
+                try:
+                    os.remove(options.getPath(file_name + '.' + image_format))
+                except FileNotFoundError:
+                    pass
+                continue
+            with open(options.getPath(file_name + '.' + image_format), 'wb') as outfile:
+                outfile.write(images[image_format])
+    print("Constellation", result.latin_name, "done! (rendered in %.1f ms)" % (result.metrics['seconds'].get('render', 0.0) * 1000))
+
+def createFetcher(options: ExtractorOptions):
+    from PageFetcher import PageFetcher
+    from ResponseCache import ResponseCache
+    cache = ResponseCache(cache_directory, ttl=cache_ttl, max_size=cache_max_size, offline=options.offline)
+    return cache, PageFetcher(max_workers=max_concurrent_downloads, max_per_host=max_downloads_per_host, cache=cache)
+
+def loadConstellations(constellations: list, options: ExtractorOptions, fetcher=None):
+    # Loads constellations without scaling them, streamed one after another or from pages downloaded concurrently
+    if options.isStreaming():
+        for constellation in constellations:
+            loadConstellation(constellation, iterStarTables(constellation, options))
+        return
+    if fetcher is None:
+        cache, fetcher = createFetcher(options)
+    for constellation, page in fetcher.fetchAll(constellations, 'table_url'):
+        loadConstellation(constellation, page)
+
+def buildAtlas(names: list = None, **settings):
+    ## Load the constellations without scaling them and project them into one sky chart
+    from SkyAtlas import renderAtlas
+    options = ExtractorOptions(**settings)
+    constellations = [constellation.copy() for constellation in selectConstellations(names)]
+    loadConstellations(constellations, options)
+    directory = options.getPath(atlas_directory)
+    tiles = renderAtlas(constellations, directory, atlas_tile_size, atlas_max_zoom, options.worker_count)
+    print("Atlas with", len(tiles), "tiles written to", directory)
+    return tiles
+
+def buildRegistry(names: list = None, **settings):
+    """Loads the constellations with the given names (all without names) into one StarRegistry for cone and nearest star searches."""
+    options = ExtractorOptions(**settings)
+    constellations = [constellation.copy() for constellation in selectConstellations(names)]
+    loadConstellations(constellations, options)
+    # Added in the order of constellation_list, a star on several pages belongs to the first one
+    registry = StarRegistry()
+    for constellation in constellations:
+        registry.addConstellation(constellation)
+    registry.build()
+    return registry
+
+def extract(names: list = None, write: bool = True, **settings):
+    """Processes the constellations with the given names (all without names) and returns their results.
+
+    names may be latin, german or english names or abbreviations, settings are ExtractorOptions
+    like outputs=['json'] or x_target=3840. With write=False nothing is written to disk and every
+    constellation is processed; otherwise unchanged constellations are skipped and only the
+    rebuilt ones are returned.
+    """
+    options = ExtractorOptions(**settings)
+    # Profiling only one constellation happens inside processConstellation
+    with profiled(options.profiler if options.profile_constellation is None else None, os.path.join(options.getPath(profile_directory), 'run')):
+        return buildConstellations(selectConstellations(names), options, write)
+
+def buildConstellations(constellations: list, options: ExtractorOptions, write: bool):
+    ## Download all constellations concurrently and process each one as soon as its page arrives
+    if write:
+        os.makedirs(options.output_directory, exist_ok=True)
+    # Streamed constellations are read by the processes that handle them
+    cache, fetcher = (None, None) if options.isStreaming() else createFetcher(options)
+    if options.catalogue_file is not None:
+        # Builds the index of the bulk catalogue once before the worker processes open it
+        getSource(options)
+    executor = None
+    # Starting worker processes costs more than processing a single constellation
+    if min(options.worker_count, len(constellations)) > 1:
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+        executor = ProcessPoolExecutor(max_workers=min(options.worker_count, len(constellations)), mp_context=multiprocessing.get_context('spawn'))
+    from concurrent.futures import Future
+    positions = {id(constellation): position for position, constellation in enumerate(constellations)}
+    pending = {}
+    next_position = 0
+    results = []
+    unresolved_report = {}
+    manifest = loadManifest(options.getPath(manifest_file)) if write else {}
+    fingerprints = {}
+    packed = loadPackedCatalogue(options.getPath(packed_file)) if write and 'pack' in options.outputs else {}
+    run_metrics = RunMetrics()
+    # The pages holding the stars of every constellation as of the last run, so a connection to a star of another
+    # constellation only loads that page; while it is incomplete such constellations are rendered after all others
+    latin_names = [constellation.latin_name for constellation in constellation_list]
+    index = StarIndex(getIndexSettings(options))
+    index.load(options.getPath(star_index_file))
+    defer = not index.isComplete(latin_names)
+    dependencies = {constellation.latin_name: index.getDependencies(constellation.latin_name, constellation.connection_list, latin_names) for constellation in constellations}
+    pages = {}
+    borrowed_report = {}
+    
+    def finishDeferred(deferred: DeferredConstellation):
+        # Looks up the pages of the unresolved connections, indexing the pages no run has seen yet if necessary
+        owners = index.getOwners(deferred.unresolved_connections, latin_names, deferred.latin_name)
+        if sum(len(catalogue_numbers) for catalogue_numbers in owners.values()) < len(set(deferred.unresolved_connections)) and not index.isComplete(latin_names):
+            indexConstellations([constellation for constellation in constellation_list if constellation.latin_name not in index], index, options, fetcher)
+            owners = index.getOwners(deferred.unresolved_connections, latin_names, deferred.latin_name)
+        dependency_pages = None
+        if not options.isStreaming():
+            for latin_name in deferred.dependencies + list(owners):
+                if latin_name not in pages:
+                    pages[latin_name] = fetcher.fetch(getTemplate(latin_name).table_url)
+            dependency_pages = {latin_name: pages[latin_name] for latin_name in owners}
+        result = finishConstellation(deferred, list(owners), options, dependency_pages)
+        if not options.isStreaming():
+            fingerprints[result.latin_name] = getFingerprint(getTemplate(result.latin_name), pages[result.latin_name], options, {latin_name: pages[latin_name] for latin_name in result.dependencies})
+        return result
+    
+    def writeFinished(wait: bool):
+        # Results are written in the order of the constellations, no matter in which order they finish
+        nonlocal next_position
+        while next_position in pending and (wait or pending[next_position].done()):
+            result = pending[next_position].result()
+            if isinstance(result, DeferredConstellation) and not wait:
+                # Waits until the pages of all processed constellations are indexed
+                break
+            pending.pop(next_position)
+            if isinstance(result, DeferredConstellation):
+                result = finishDeferred(result)
+            if result is not None:
+                index.setStars(result.latin_name, result.stars['catalogue_number'])
+                results.append(result)
+                run_metrics.merge(result.latin_name, result.metrics)
+                if result.borrowed_stars:
+                    borrowed_report[result.latin_name] = [getTemplate(latin_name).abbreviation for latin_name in result.dependencies]
+                if result.unresolved_connections:
+                    unresolved_report[result.latin_name] = result.unresolved_connections
+                if write:
+                    writeResult(result, options)
+                    manifest[result.latin_name] = result.fingerprint or fingerprints[result.latin_name]
+                    packed[result.latin_name] = (result.names, result.arrays)
+            next_position += 1
+    
+    def indexFinished():
+        # Adds the pages of all processed constellations before the deferred ones are finished
+        for position in sorted(pending):
+            result = pending[position].result()
+            if result is not None:
+                index.setStars(result.latin_name, result.stars['catalogue_number'])
+    
+    def submit(position: int, constellation: Constellation, page: str, previous_fingerprint: str = None):
+        dependency_pages = {latin_name: pages[latin_name] for latin_name in dependencies[constellation.latin_name]} if page is not None else None
+        arguments = (constellation, page, options, dependencies[constellation.latin_name], dependency_pages, previous_fingerprint, defer)
+        if executor is None:
+            pending[position] = Future()
+            pending[position].set_result(processConstellation(*arguments))
+        else:
+            pending[position] = executor.submit(processConstellation, *arguments)
+    
+    if options.isStreaming():
+        for position, template in enumerate(constellations):
+            constellation = template.copy()
+            # The source is only compared with the previous fingerprint if all outputs exist
+            previous_fingerprint = manifest.get(constellation.latin_name)
+            if not write or not isUpToDate(manifest, packed, constellation, previous_fingerprint, options):
+                previous_fingerprint = None
+            submit(position, constellation, None, previous_fingerprint)
+            writeFinished(False)
+    else:
+        # The pages of the constellations holding borrowed stars are downloaded as well, a constellation is
+        # processed once its own page and theirs arrived
+        required = list(constellations)
+        for latin_names_of_dependencies in dependencies.values():
+            for latin_name in latin_names_of_dependencies:
+                if all(constellation.latin_name != latin_name for constellation in required):
+                    required.append(getTemplate(latin_name))
+        waiting = list(constellations)
+        for template, page in fetcher.fetchAll(required, 'table_url'):
+            pages[template.latin_name] = page
+            if id(template) in positions:
+                run_metrics.getConstellation(template.latin_name).seconds['download'] = fetcher.fetch_times[template.table_url]
+            for waiting_template in [waiting_template for waiting_template in waiting if all(latin_name in pages for latin_name in [waiting_template.latin_name] + dependencies[waiting_template.latin_name])]:
+                waiting.remove(waiting_template)
+                position = positions[id(waiting_template)]
+                constellation = waiting_template.copy()
+                fingerprints[constellation.latin_name] = getFingerprint(constellation, pages[constellation.latin_name], options, {latin_name: pages[latin_name] for latin_name in dependencies[constellation.latin_name]})
+                if write and isUpToDate(manifest, packed, constellation, fingerprints[constellation.latin_name], options):
+                    # Unchanged constellations keep their place in the output order without being processed
+                    pending[position] = Future()
+                    pending[position].set_result(None)
+                else:
+                    submit(position, constellation, pages[constellation.latin_name])
+            writeFinished(False)
+    indexFinished()
+    writeFinished(True)
+    
+    if executor is not None:
+        executor.shutdown()
+    skipped = len(constellations) - len(results)
+    counters = run_metrics.toDict()['totals']['counters']
+    if fetcher is not None:
+        fetcher.close()
+        cache_statistics = cache.getStatistics()
+    else:
+        # Counted by the processes that streamed the constellations
+        cache_statistics = {'hits': counters.get('cache_hits', 0), 'misses': counters.get('cache_misses', 0)}
+    if options.catalogue_file is None:
+        print("Cache hits:", cache_statistics['hits'], "misses:", cache_statistics['misses'])
+    print("Constellations rebuilt:", len(constellations) - skipped, "skipped:", skipped)
+    if counters.get('stars'):
+        print("Star storage: %.1f bytes per star" % (counters['star_bytes'] / counters['stars']))
+    for latin_name, abbreviations in sorted(borrowed_report.items()):
+        print("Stars borrowed by", latin_name, "from:", abbreviations)
+    for latin_name, catalogue_numbers in sorted(unresolved_report.items()):
+        print("Unresolved connections in", latin_name + ":", catalogue_numbers)
+    run_metrics.run = {'import_seconds': import_seconds, 'worker_count': options.worker_count, 'rebuilt': len(constellations) - skipped, 'skipped': skipped, 'cache': cache_statistics, 'borrowed_stars': borrowed_report, 'unresolved_connections': unresolved_report}
+    if write:
+        saveManifest(options.getPath(manifest_file), manifest)
+        index.save(options.getPath(star_index_file))
+        if 'pack' in options.outputs:
+            from PackedCatalogue import writePackedCatalogue
+            writePackedCatalogue(options.getPath(packed_file), [packed[constellation.latin_name] for constellation in constellation_list if constellation.latin_name in packed])
+        run_metrics.write(options.getPath(metrics_file))
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description='Extracts star constellations from VizieR and writes them as JSON and images.')
+    parser.add_argument('constellations', nargs='*', help='latin, german or english names or abbreviations, all constellations if omitted')
+    parser.add_argument('--output', nargs='+', choices=['json', 'png', 'svg', 'pack', 'both'], default=outputs, help='files to write, both means json and png (default: %(default)s)')
+    parser.add_argument('--output-directory', default=output_directory)
+    parser.add_argument('--size', help='image size as WIDTHxHEIGHT (default: %dx%d)' % (x_target, y_target))
+    parser.add_argument('--projection', choices=sorted(projections), default=projection, help='projection of the main view (default: %(default)s)')
+    parser.add_argument('--view', action='append', default=list(views), help='additional view as PROJECTION:WIDTHxHEIGHT, may be repeated')
+    parser.add_argument('--compact-json', action='store_true', help='write JSON without indentation')
+    parser.add_argument('--workers', type=int, default=worker_count, help='number of processes (default: %(default)s)')
+    parser.add_argument('--offline', action='store_true', help='only use cached pages')
+    parser.add_argument('--page-size', type=int, default=page_size, help='read all stars in pages of this many rows instead of the first 200')
+    parser.add_argument('--magnitude-limit', type=float, default=magnitude_limit, help='only read stars up to this visual magnitude')
+    parser.add_argument('--catalogue', default=catalogue_file, help='local tab-separated catalogue with a Cst column to read instead of VizieR')
+    parser.add_argument('--chunk-size', type=int, default=chunk_size, help='rows parsed and converted at once when streaming (default: %(default)s)')
+    parser.add_argument('--force', action='store_true', help='rebuild unchanged constellations too')
+    parser.add_argument('--atlas', action='store_true', default=atlas, help='render a tiled all-sky chart instead')
+    parser.add_argument('--profile', choices=['cprofile', 'tracemalloc'], default=profiler)
+    parser.add_argument('--profile-constellation', default=profile_constellation, help='only profile this constellation (latin name)')
+    parser.add_argument('--list', action='store_true', help='list all constellations and exit')
+    arguments = parser.parse_args()
+    
+    if arguments.list:
+        for constellation in constellation_list:
+            print(constellation.abbreviation, constellation.latin_name, '/', constellation.german_name, '/', constellation.english_name)
+        return
+    selected_outputs = []
+    for output in arguments.output:
+        for selected_output in (['json', 'png'] if output == 'both' else [output]):
+            if selected_output not in selected_outputs:
+                selected_outputs.append(selected_output)
+    settings = {
+        'outputs': selected_outputs,
+        'output_directory': arguments.output_directory,
+        'projection': arguments.projection,
+        'views': arguments.view,
+        'json_indent': None if arguments.compact_json else json_indent,
+        'worker_count': arguments.workers,
+        'offline': arguments.offline or offline,
+        'page_size': arguments.page_size,
+        'magnitude_limit': arguments.magnitude_limit,
+        'catalogue_file': arguments.catalogue,
+        'chunk_size': arguments.chunk_size,
+        'force_rebuild': arguments.force or force_rebuild,
+        'profiler': arguments.profile,
+        'profile_constellation': arguments.profile_constellation
     }
-    data['stars'] = []
-    for star in constellation.star_list:
-        main_star = False
-        if len(star.connections) > 0:
-            main_star = True
-        data['stars'].append({
-            'id': star.star_id,
-            'x': float(star.x),
-            'y': float(star.y),
-            'z': float(star.z),
-            'visualMagnitude': star.visual_magnitude,
-            'bayerDesignation': star.bayer_designation,
-            "mainStar": main_star,
-            "connection": star.connections
-        })
-    
-    with open('output/' + constellation.latin_name + '.json', 'w') as outfile:
-        json.dump(data, outfile, indent=2)
-    
-    constellation.drawPNG()
-    
-    print("Constellation", constellation.latin_name, "done!")
\ No newline at end of file
+    if arguments.size:
+        try:
+            settings['x_target'], settings['y_target'] = (int(value) for value in arguments.size.lower().split('x'))
+        except ValueError:
+            parser.error('--size has to be WIDTHxHEIGHT')
+    try:
+        selectConstellations(arguments.constellations)
+        ExtractorOptions(**settings)
+    except ValueError as error:
+        parser.error(str(error))
+    if arguments.atlas:
+        buildAtlas(arguments.constellations, **settings)
+    else:
+        extract(arguments.constellations, **settings)
+
+import_seconds = time.perf_counter() - import_start
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,251 @@
+#!/usr/bin/python3
+
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+
+# Height of the declination zones of the spatial index
+zone_height = np.radians(1.0)
+
+# Columns of the star arrays the registry takes and returns, coordinates are unit vectors
+star_columns = ['catalogue_number', 'star_id', 'x', 'y', 'z', 'visual_magnitude', 'bayer_designation']
+
+def getUnitVector(right_ascension: float, declination: float):
+    # Right ascension and declination in degrees
+    ra = np.radians(right_ascension)
+    dec = np.radians(declination)
+    return np.array((np.cos(dec) * np.cos(ra), np.cos(dec) * np.sin(ra), np.sin(dec)))
+
+class StarRegistry():
+    """All stars of all constellations, each Henry Draper Catalog Number once, with a zone index over the sky.
+
+    The sky is cut into declination zones of zone_height, the stars of every zone are sorted by right
+    ascension. A cone search only looks at the right ascension window of the cone in the zones it
+    overlaps and checks the candidates with one dot product each. Stars of later constellations whose
+    catalogue number is already known are dropped, so every star is stored once.
+    """
+    def __init__(self, zone_height: float = zone_height):
+        self.zone_height = zone_height
+        self.zone_count = int(np.ceil(np.pi / zone_height))
+        self.abbreviations = []
+        self.catalogue_number_index = {}
+        self.pending = []
+        self.columns = {}
+        self.duplicates = 0
+        self.order = np.empty(0, dtype=np.int64)
+        self.zone_right_ascension = np.empty(0)
+        self.zone_starts = np.zeros(self.zone_count + 1, dtype=np.int64)
+        self.vectors = np.empty((0, 3))
+
+    def __len__(self):
+        return len(self.catalogue_number_index)
+
+    def __contains__(self, catalogue_number: int):
+        return catalogue_number in self.catalogue_number_index
+
+    def addStars(self, abbreviation: str, stars: dict):
+        # Adds the stars of one constellation, stars maps every column in star_columns to an array
+        if abbreviation not in self.abbreviations:
+            self.abbreviations.append(abbreviation)
+        new = []
+        for position, catalogue_number in enumerate(np.asarray(stars['catalogue_number']).tolist()):
+            if catalogue_number < 0 or np.isnan(stars['x'][position]):
+                continue
+            if catalogue_number in self.catalogue_number_index:
+                self.duplicates += 1
+                continue
+            self.catalogue_number_index[catalogue_number] = len(self.catalogue_number_index)
+            new.append(position)
+        if new:
+            rows = {column: np.asarray(stars[column])[new] for column in star_columns}
+            rows['constellation'] = np.full(len(new), self.abbreviations.index(abbreviation), dtype=np.int16)
+            self.pending.append(rows)
+
+    def addConstellation(self, constellation):
+        # The coordinates of the constellation must not be scaled yet
+        self.addStars(constellation.abbreviation, constellation.getStarArrays())
+
+    def build(self):
+        # Appends the pending stars and sorts them into the zones, queries call it when needed
+        if not self.pending:
+            return
+        parts = ([self.columns] if self.columns else []) + self.pending
+        self.columns = {column: np.concatenate([rows[column] for rows in parts]) for column in self.pending[0]}
+        self.pending = []
+        x = self.columns['x']
+        y = self.columns['y']
+        z = self.columns['z']
+        right_ascension = np.mod(np.arctan2(y, x), 2 * np.pi)
+        zones = self.getZone(np.arcsin(np.clip(z, -1.0, 1.0)))
+        self.order = np.lexsort((right_ascension, zones))
+        self.zone_right_ascension = right_ascension[self.order]
+        self.zone_starts = np.searchsorted(zones[self.order], np.arange(self.zone_count + 1))
+        # Unit vectors in zone order, so the candidates of a zone are contiguous in memory
+        self.vectors = np.stack((x, y, z), axis=1)[self.order]
+
+    def getZone(self, declination):
+        return np.clip(((declination + np.pi / 2) / self.zone_height).astype(np.int64), 0, self.zone_count - 1)
+
+    def getIndex(self, catalogue_number: int):
+        return self.catalogue_number_index.get(catalogue_number)
+
+    def getStars(self, indices):
+        # Columns of the stars at the given registry indices, 'constellation' holds their abbreviations
+        self.build()
+        indices = np.asarray(indices, dtype=np.int64)
+        if not self.columns:
+            return {column: np.empty(0) for column in star_columns + ['constellation']}
+        stars = {column: self.columns[column][indices] for column in star_columns}
+        stars['constellation'] = [self.abbreviations[code] for code in self.columns['constellation'][indices].tolist()]
+        return stars
+
+    def getStarsByCatalogueNumber(self, catalogue_numbers: list):
+        # Stars of the known catalogue numbers, unknown numbers are left out
+        return self.getStars([self.catalogue_number_index[number] for number in catalogue_numbers if number in self.catalogue_number_index])
+
+    def getCandidates(self, vector, radius: float):
+        # Positions in zone order of all stars in the zones and right ascension windows the cone overlaps
+        declination = np.arcsin(np.clip(vector[2], -1.0, 1.0))
+        right_ascension = np.mod(np.arctan2(vector[1], vector[0]), 2 * np.pi)
+        first_zone = int(self.getZone(declination - radius))
+        last_zone = int(self.getZone(declination + radius))
+        if abs(declination) + radius >= np.pi / 2:
+            # The cone contains a pole, every right ascension is inside
+            return np.arange(self.zone_starts[first_zone], self.zone_starts[last_zone + 1])
+        width = np.arcsin(min(1.0, np.sin(radius) / np.cos(declination)))
+        windows = [(right_ascension - width, right_ascension + width)]
+        if windows[0][0] < 0:
+            windows = [(0.0, windows[0][1]), (windows[0][0] + 2 * np.pi, 2 * np.pi)]
+        elif windows[0][1] > 2 * np.pi:
+            windows = [(windows[0][0], 2 * np.pi), (0.0, windows[0][1] - 2 * np.pi)]
+        ranges = []
+        for zone in range(first_zone, last_zone + 1):
+            start = self.zone_starts[zone]
+            end = self.zone_starts[zone + 1]
+            zone_right_ascension = self.zone_right_ascension[start:end]
+            for low, high in windows:
+                ranges.append(np.arange(start + np.searchsorted(zone_right_ascension, low), start + np.searchsorted(zone_right_ascension, high, 'right')))
+        return np.concatenate(ranges)
+
+    def coneSearch(self, right_ascension: float, declination: float, radius: float):
+        """Registry indices and angular distances (degrees) of all stars within radius degrees, nearest first."""
+        self.build()
+        return self.searchVector(getUnitVector(right_ascension, declination), np.radians(radius))
+
+    def searchVector(self, vector, radius: float):
+        candidates = self.getCandidates(vector, radius)
+        dots = self.vectors[candidates] @ vector
+        inside = dots >= np.cos(radius)
+        candidates = candidates[inside]
+        dots = dots[inside]
+        nearest = np.argsort(-dots, kind='stable')
+        return self.order[candidates[nearest]], np.degrees(np.arccos(np.clip(dots[nearest], -1.0, 1.0)))
+
+    def getNearest(self, right_ascension: float, declination: float, count: int = 1):
+        """Registry indices and angular distances (degrees) of the count stars nearest to a sky position."""
+        self.build()
+        vector = getUnitVector(right_ascension, declination)
+        count = min(count, len(self.order))
+        radius = self.zone_height
+        while True:
+            # All stars within radius are found, so the nearest ones are exact once there are enough of them
+            indices, distances = self.searchVector(vector, min(radius, np.pi))
+            if len(indices) >= count or radius >= np.pi:
+                return indices[:count], distances[:count]
+            radius *= 2
+
+class StarIndex():
+    """Henry Draper Catalog Numbers on the page of every constellation, kept between runs.
+
+    Connections to stars of other constellations are resolved by loading only the pages that hold
+    them instead of every page. settings describes the source of the pages (like the magnitude
+    limit), an index saved with other settings is not loaded.
+    """
+    def __init__(self, settings: str = ''):
+        self.settings = settings
+        self.catalogue_numbers = {}
+
+    def __contains__(self, latin_name: str):
+        return latin_name in self.catalogue_numbers
+
+    def setStars(self, latin_name: str, catalogue_numbers):
+        catalogue_numbers = np.unique(np.asarray(catalogue_numbers, dtype=np.int64))
+        self.catalogue_numbers[latin_name] = catalogue_numbers[catalogue_numbers >= 0]
+
+    def isComplete(self, latin_names: list):
+        return all(latin_name in self for latin_name in latin_names)
+
+    def getOwners(self, catalogue_numbers, latin_names: list, exclude: str = None):
+        # The first constellation of latin_names (besides exclude) whose page holds each number, numbers on no known page are left out
+        owners = {}
+        remaining = np.unique(np.asarray(catalogue_numbers, dtype=np.int64))
+        for latin_name in latin_names:
+            if len(remaining) == 0:
+                break
+            if latin_name == exclude or latin_name not in self:
+                continue
+            found = np.isin(remaining, self.catalogue_numbers[latin_name])
+            if np.any(found):
+                owners[latin_name] = remaining[found].tolist()
+                remaining = remaining[~found]
+        return owners
+
+    def getDependencies(self, latin_name: str, connection_list: list, latin_names: list):
+        # Constellations of latin_names holding the connections that are not on the own page, none while the own page is unknown
+        if latin_name not in self:
+            return []
+        missing = np.setdiff1d(np.asarray(connection_list, dtype=np.int64), self.catalogue_numbers[latin_name])
+        return list(self.getOwners(missing, latin_names, latin_name))
+
+    def load(self, path: str):
+        try:
+            with np.load(path) as index:
+                if str(index['settings']) != self.settings:
+                    return False
+                latin_names = index['latin_names'].tolist()
+                starts = index['starts']
+                catalogue_numbers = index['catalogue_numbers']
+        except (OSError, KeyError, ValueError):
+            return False
+        self.catalogue_numbers = {latin_name: catalogue_numbers[starts[position]:starts[position + 1]] for position, latin_name in enumerate(latin_names)}
+        return True
+
+    def save(self, path: str):
+        latin_names = sorted(self.catalogue_numbers)
+        starts = np.concatenate(([0], np.cumsum([len(self.catalogue_numbers[latin_name]) for latin_name in latin_names]))).astype(np.int64)
+        catalogue_numbers = np.concatenate([self.catalogue_numbers[latin_name] for latin_name in latin_names]) if latin_names else np.empty(0, dtype=np.int64)
+        file_descriptor, temporary_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix='.tmp')
+        with os.fdopen(file_descriptor, 'wb') as outfile:
+            np.savez(outfile, settings=np.array(self.settings), latin_names=np.array(latin_names, dtype=str), starts=starts, catalogue_numbers=catalogue_numbers)
+        os.replace(temporary_path, path)
+
+if __name__ == '__main__':
+    # Measures the query latency on random stars: StarRegistry.py [stars]
+    star_count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    generator = np.random.default_rng(0)
+    vectors = generator.normal(size=(star_count, 3))
+    vectors /= np.linalg.norm(vectors, axis=1)[:, np.newaxis]
+    registry = StarRegistry()
+    start = time.perf_counter()
+    registry.addStars('Syn', {
+        'catalogue_number': np.arange(star_count),
+        'star_id': np.arange(star_count),
+        'x': vectors[:, 0],
+        'y': vectors[:, 1],
+        'z': vectors[:, 2],
+        'visual_magnitude': generator.uniform(-1.0, 12.0, star_count),
+        'bayer_designation': np.full(star_count, '')
+    })
+    registry.build()
+    print(star_count, 'stars', 'build: %.2f ms' % ((time.perf_counter() - start) * 1000))
+    positions = np.stack((generator.uniform(0.0, 360.0, 1000), np.degrees(np.arcsin(generator.uniform(-1.0, 1.0, 1000)))), axis=1).tolist()
+    for name, query in (('nearest', lambda position: registry.getNearest(*position)),
+                        ('10 nearest', lambda position: registry.getNearest(*position, count=10)),
+                        ('cone 1 deg', lambda position: registry.coneSearch(*position, 1.0)),
+                        ('cone 5 deg', lambda position: registry.coneSearch(*position, 5.0))):
+        start = time.perf_counter()
+        for position in positions:
+            query(position)
+        print(name, '%.3f ms' % ((time.perf_counter() - start) / len(positions) * 1000))
@@ -0,0 +1,133 @@
+#!/usr/bin/python3
+
+import io
+import sys
+import time
+import tracemalloc
+
+# Column names of the IV/27 catalogue and the alternatives that are accepted in the header
+star_columns = {
+    'Full': ('Full', 'recno', '_1'),
+    'HD': ('HD',),
+    'RAJ2000': ('RAJ2000', '_RAJ2000'),
+    'DEJ2000': ('DEJ2000', '_DEJ2000'),
+    'Vmag': ('Vmag',),
+    'Bayer': ('Bayer',)
+}
+
+def getTableURL(url: str):
+    # The same query against VizieR's tab-separated ASU output instead of the HTML page
+    return url.replace('/VizieR-4?', '/asu-tsv?')
+
+class StarTable():
+    """Typed columns of one constellation page after adjacent duplicates were removed."""
+    def __init__(self):
+        self.star_id = []
+        self.catalogue_number = []
+        self.right_ascension = []
+        self.declination = []
+        self.visual_magnitude = []
+        self.bayer_designation = []
+        self.rows = 0
+        self.duplicates = 0
+        self.conversion_failures = 0
+
+    def __len__(self):
+        return len(self.star_id)
+
+class TSVTableParser():
+    """Parses VizieR's tab-separated output line by line into StarTables.
+
+    Only the first table of a response is read and only the columns in star_columns are kept.
+    The row count and the last catalogue number are carried over between calls, so the pages of
+    one constellation can be parsed one after another like a single table.
+    """
+    def __init__(self):
+        self.rows = 0
+        self.last_catalogue_number = None
+
+    def parseLines(self, lines):
+        table = StarTable()
+        for chunk in self.parseChunks(lines):
+            table = chunk
+        return table
+
+    def parseChunks(self, lines, chunk_size: int = None, header: list = None):
+        # Yields StarTables of at most chunk_size stars, or exactly one table of all stars if chunk_size is None
+        table = StarTable()
+        indices = self.getColumnIndices(header) if header is not None else None
+        skip = 0
+        for line in lines:
+            line = line.rstrip('\r\n')
+            if indices is None:
+                if line == '' or line.startswith('#'):
+                    continue
+                indices = self.getColumnIndices([name.strip() for name in line.split('\t')])
+                # Unit line and dash separator line
+                skip = 2
+                continue
+            if skip > 0:
+                skip -= 1
+                continue
+            if line == '' or line.startswith('#'):
+                break
+            fields = line.split('\t')
+            table.rows += 1
+            self.rows += 1
+            catalogue_number = self.getField(fields, indices['HD'])
+            # Removes doubles
+            if catalogue_number != '' and catalogue_number == self.last_catalogue_number:
+                table.duplicates += 1
+                continue
+            self.last_catalogue_number = catalogue_number
+            star_id = self.getField(fields, indices['Full']) if indices['Full'] is not None else str(self.rows)
+            try:
+                star_id = int(star_id)
+                catalogue_number = int(catalogue_number)
+                visual_magnitude = float(self.getField(fields, indices['Vmag']))
+            except ValueError:
+                star_id = -1
+                catalogue_number = -1
+                visual_magnitude = -1.0
+                table.conversion_failures += 1
+            table.star_id.append(star_id)
+            table.catalogue_number.append(catalogue_number)
+            table.right_ascension.append(self.getField(fields, indices['RAJ2000']))
+            table.declination.append(self.getField(fields, indices['DEJ2000']))
+            table.visual_magnitude.append(visual_magnitude)
+            table.bayer_designation.append(self.getField(fields, indices['Bayer']))
+            if chunk_size is not None and len(table) >= chunk_size:
+                yield table
+                table = StarTable()
+        if table.rows > 0 or chunk_size is None:
+            yield table
+
+    def parseText(self, text: str):
+        return self.parseLines(io.StringIO(text))
+
+    def getColumnIndices(self, header: list):
+        indices = {}
+        for column, names in star_columns.items():
+            indices[column] = next((header.index(name) for name in names if name in header), None)
+            if indices[column] is None and column != 'Full':
+                raise ValueError('Column ' + column + ' is missing in the table header')
+        return indices
+
+    def getField(self, fields: list, index: int):
+        if index >= len(fields):
+            return ''
+        return fields[index].strip()
+
+if __name__ == '__main__':
+    # Measures parse time and peak memory for saved pages: TSVTableParser.py page.tsv [...]
+    for path in sys.argv[1:]:
+        with open(path, encoding='utf-8') as infile:
+            text = infile.read()
+        tracemalloc.start()
+        start = time.perf_counter()
+        # Every page is its own table, a shared parser would carry the row count and last catalogue number over
+        table = TSVTableParser().parseText(text)
+        duration = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(path, len(table), 'stars', table.duplicates, 'duplicates', '%.3f ms' % (duration * 1000), '%.1f KiB peak' % (peak / 1024))
@@ -0,0 +1,20 @@
+import os
+import sys
+import pytest
+
+# The modules live in the repository root and are not installed
+root_directory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root_directory)
+fixture_directory = os.path.join(root_directory, 'benchmarks', 'fixtures')
+
+@pytest.fixture
+def fixture_cache(tmp_path, monkeypatch):
+    """A temporary working directory whose response cache holds the benchmark fixture of every constellation."""
+    import StarConstellationExtractor as extractor
+    from ResponseCache import ResponseCache
+    monkeypatch.chdir(tmp_path)
+    cache = ResponseCache(extractor.cache_directory)
+    for constellation in extractor.constellation_list:
+        with open(os.path.join(fixture_directory, constellation.latin_name + '.tsv'), encoding='utf-8') as infile:
+            cache.put(constellation.table_url, infile.read())
+    return tmp_path
@@ -0,0 +1,89 @@
+import asyncio
+import threading
+import time
+import pytest
+import StarConstellationExtractor as extractor
+from ChartServer import ChartServer, RenderCache
+from Projection import View
+
+def test_render_cache_eviction():
+    cache = RenderCache(10)
+    cache.put('a', b'1234')
+    cache.put('b', b'1234')
+    assert cache.get('a') == b'1234'
+    # b is the least recently used entry
+    cache.put('c', b'1234')
+    assert cache.get('b') is None
+    assert cache.get('a') == b'1234' and cache.get('c') == b'1234'
+    cache.put('d', b'12345678901')
+    assert cache.get('d') is None
+    statistics = cache.getStatistics()
+    assert (statistics['entries'], statistics['bytes'], statistics['evictions']) == (2, 8, 1)
+    assert (statistics['hits'], statistics['misses']) == (3, 2)
+
+class SlowRender():
+    """Replaces ChartServer.render, every render waits until release is set."""
+    def __init__(self, error: Exception = None):
+        self.release = threading.Event()
+        self.error = error
+        self.count = 0
+
+    def __call__(self, constellation, file_format: str, view: View):
+        self.count += 1
+        self.release.wait(5)
+        if self.error is not None:
+            raise self.error
+        return b'chart of ' + constellation.latin_name.encode('utf-8')
+
+@pytest.fixture
+def server():
+    chart_server = ChartServer([constellation.copy() for constellation in extractor.constellation_list[:2]])
+    yield chart_server
+    chart_server.executor.shutdown(wait=True)
+
+async def startRequests(server: ChartServer, count: int):
+    constellation = server.constellations[0]
+    tasks = [asyncio.ensure_future(server.getChart(constellation, 'png', View())) for index in range(count)]
+    # Lets every request reach the render or join it
+    await asyncio.sleep(0.05)
+    return tasks
+
+def test_concurrent_requests_share_one_render(server):
+    render = server.render = SlowRender()
+
+    async def run():
+        tasks = await startRequests(server, 3)
+        render.release.set()
+        return await asyncio.wait_for(asyncio.gather(*tasks), 5)
+    assert asyncio.run(run()) == [b'chart of Andromeda'] * 3
+    assert render.count == 1
+    assert server.coalesced == 2
+    assert server.rendering == {}
+    assert server.cache.get(('Andromeda', 'png', View().getKey())) == b'chart of Andromeda'
+
+def test_cancelled_request_does_not_stall_the_others(server):
+    render = server.render = SlowRender()
+
+    async def run():
+        first, second = await startRequests(server, 2)
+        first.cancel()
+        await asyncio.sleep(0.05)
+        render.release.set()
+        data = await asyncio.wait_for(second, 5)
+        assert first.cancelled()
+        return data
+    assert asyncio.run(run()) == b'chart of Andromeda'
+    assert render.count == 1
+    assert server.rendering == {}
+
+def test_failed_render_reaches_every_request(server):
+    render = server.render = SlowRender(RuntimeError('broken'))
+
+    async def run():
+        tasks = await startRequests(server, 2)
+        render.release.set()
+        return await asyncio.wait_for(asyncio.gather(*tasks, return_exceptions=True), 5)
+    results = asyncio.run(run())
+    assert [str(result) for result in results] == ['broken', 'broken']
+    assert server.rendering == {}
+    assert server.cache.get(('Andromeda', 'png', View().getKey())) is None
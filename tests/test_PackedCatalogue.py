@@ -0,0 +1,42 @@
+import numpy as np
+from PackedCatalogue import PackedCatalogue, column_types, writePackedCatalogue
+
+def makeArrays(star_count: int, seed: int):
+    generator = np.random.default_rng(seed)
+    return {
+        'x': generator.uniform(0, 1920, star_count),
+        'y': generator.uniform(0, 1080, star_count),
+        'z': generator.uniform(-1, 1, star_count),
+        'visual_magnitude': generator.uniform(0, 8, star_count),
+        'star_id': np.arange(1, star_count + 1),
+        'catalogue_number': generator.integers(1, 300000, star_count),
+        'bayer_designation': np.array([b'Alp', b'Bet', b''] * star_count, dtype='S8')[:star_count],
+        'edges': np.stack((np.arange(star_count - 1), np.arange(1, star_count)), axis=1)
+    }
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / 'constellations.pack')
+    names = [{'latin': 'Orion', 'german': 'Orion', 'english': 'Orion'}, {'latin': 'Lyra', 'german': 'Leier', 'english': 'Lyre'},
+             {'latin': 'Empty', 'german': 'Leer', 'english': 'Empty'}]
+    constellations = [(names[0], makeArrays(7, 0)), (names[1], makeArrays(3, 1)), (names[2], makeArrays(0, 2))]
+    constellations[2][1]['edges'] = np.empty((0, 2), dtype=np.int32)
+    writePackedCatalogue(path, constellations)
+    catalogue = PackedCatalogue(path)
+    mapped = np.frombuffer(catalogue.buffer, dtype=np.uint8)
+    assert catalogue.getNames() == ['Orion', 'Lyra', 'Empty']
+    assert 'Lyra' in catalogue and 'Vela' not in catalogue
+    assert catalogue.getName('Lyra') == names[1]
+    for name, arrays in constellations:
+        packed = catalogue.getConstellation(name['latin'])
+        assert sorted(packed) == sorted(column_types)
+        for column, dtype in column_types.items():
+            assert packed[column].dtype == np.dtype(dtype)
+            assert np.array_equal(packed[column], np.asarray(arrays[column], dtype=dtype))
+            # The arrays are read-only views into the mapped file, nothing is copied
+            assert not packed[column].flags.writeable
+            assert packed[column].size == 0 or np.shares_memory(packed[column], mapped)
+            assert packed[column].ctypes.data % 16 == 0 or packed[column].size == 0
+        assert packed['edges'].shape == (max(len(arrays['x']) - 1, 0), 2)
+    # The file can only be closed once no view into it is left
+    del packed, mapped
+    catalogue.close()
@@ -0,0 +1,107 @@
+import collections
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+import requests
+from PageFetcher import PageFetcher
+
+class RecordedPages():
+    """Pages served by the test server, failures are answered before a path succeeds."""
+    def __init__(self, delay: float = 0.05):
+        self.delay = delay
+        self.failures = {}
+        self.requests = collections.defaultdict(list)
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    def getPage(self, path: str):
+        return 'page of ' + path
+
+class PageHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        pages = self.server.pages
+        with pages.lock:
+            pages.requests[self.path].append(time.perf_counter())
+            pages.in_flight += 1
+            pages.max_in_flight = max(pages.max_in_flight, pages.in_flight)
+            failures = pages.failures.get(self.path, [])
+            status = failures.pop(0) if failures else 200
+        time.sleep(pages.delay)
+        with pages.lock:
+            pages.in_flight -= 1
+        body = (pages.getPage(self.path) if status == 200 else 'error').encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/plain; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+class Item():
+    def __init__(self, url: str):
+        self.url = url
+
+@pytest.fixture
+def server():
+    pages = RecordedPages()
+    http_server = ThreadingHTTPServer(('127.0.0.1', 0), PageHandler)
+    http_server.daemon_threads = True
+    http_server.pages = pages
+    thread = threading.Thread(target=http_server.serve_forever, daemon=True)
+    thread.start()
+    yield pages, 'http://127.0.0.1:%d' % http_server.server_address[1]
+    http_server.shutdown()
+    http_server.server_close()
+
+def test_host_limit(server):
+    pages, base_url = server
+    fetcher = PageFetcher(max_workers=8, max_per_host=2)
+    results = list(fetcher.fetchAll([Item('%s/page/%d' % (base_url, index)) for index in range(12)]))
+    fetcher.close()
+    assert len(results) == 12
+    assert pages.max_in_flight == 2
+
+def test_every_item_once(server):
+    pages, base_url = server
+    items = [Item('%s/page/%d' % (base_url, index)) for index in range(20)]
+    pages.failures['/page/3'] = [503]
+    pages.failures['/page/7'] = [429]
+    fetcher = PageFetcher(max_workers=4, max_per_host=4, backoff_factor=0.01)
+    results = list(fetcher.fetchAll(items))
+    fetcher.close()
+    counts = collections.Counter(id(item) for item, page in results)
+    assert sorted(counts.values()) == [1] * len(items)
+    assert set(counts) == set(id(item) for item in items)
+    for item, page in results:
+        assert page == pages.getPage(item.url[len(base_url):])
+
+def test_retry_with_backoff(server):
+    pages, base_url = server
+    pages.delay = 0
+    pages.failures['/retried'] = [503, 429, 500]
+    fetcher = PageFetcher(max_workers=1, max_per_host=1, retries=3, backoff_factor=0.1)
+    page = fetcher.fetch(base_url + '/retried')
+    fetcher.close()
+    assert page == pages.getPage('/retried')
+    times = pages.requests['/retried']
+    assert len(times) == 4
+    # The waits double after the first retry: 0.2 and 0.4 seconds
+    gaps = [later - earlier for earlier, later in zip(times, times[1:])]
+    assert gaps[1] >= 0.18
+    assert gaps[2] >= 0.36
+
+def test_retries_exhausted(server):
+    pages, base_url = server
+    pages.delay = 0
+    pages.failures['/broken'] = [502] * 10
+    fetcher = PageFetcher(max_workers=1, max_per_host=1, retries=2, backoff_factor=0)
+    with pytest.raises(requests.exceptions.RetryError):
+        fetcher.fetch(base_url + '/broken')
+    fetcher.close()
+    assert len(pages.requests['/broken']) == 3
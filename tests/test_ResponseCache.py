@@ -0,0 +1,45 @@
+import os
+import time
+import pytest
+from ResponseCache import CacheMissError, ResponseCache
+
+url = 'http://vizier.example/viz-bin/asu-tsv?-source=IV/27A/catalog&Cst=Ori'
+
+def storeStale(directory: str):
+    cache = ResponseCache(str(directory), ttl=60)
+    cache.put(url, 'page')
+    stored = time.time() - 3600
+    os.utime(cache.getPath(url), (stored, stored))
+
+def test_stale_entry_is_a_miss_online(tmp_path):
+    storeStale(tmp_path)
+    cache = ResponseCache(str(tmp_path), ttl=60)
+    assert cache.get(url) is None
+    assert cache.misses == 1
+
+def test_stale_entry_is_served_offline(tmp_path):
+    storeStale(tmp_path)
+    cache = ResponseCache(str(tmp_path), ttl=60, offline=True)
+    assert cache.get(url) == 'page'
+    assert cache.hits == 1
+
+def test_offline_miss(tmp_path):
+    cache = ResponseCache(str(tmp_path), offline=True)
+    with pytest.raises(CacheMissError):
+        cache.get(url)
+
+class VanishedEntry():
+    """A directory entry that another process removed between the directory scan and its stat."""
+    name = 'vanished.gz'
+    path = 'vanished.gz'
+
+    def stat(self):
+        raise FileNotFoundError(self.path)
+
+def test_eviction_skips_vanished_entries(tmp_path, monkeypatch):
+    cache = ResponseCache(str(tmp_path), max_size=1)
+    scandir = os.scandir
+    monkeypatch.setattr(os, 'scandir', lambda directory: list(scandir(directory)) + [VanishedEntry()])
+    cache.put(url, 'page')
+    # The new entry is larger than max_size and evicted, the put itself succeeds
+    assert not os.path.exists(cache.getPath(url))
@@ -0,0 +1,130 @@
+import json
+import os
+import time
+import numpy as np
+import pytest
+import StarConstellationExtractor as extractor
+from ResponseCache import ResponseCache
+from TSVTableParser import TSVTableParser
+from conftest import fixture_directory
+
+def loadConstellation(latin_name: str):
+    template = next(constellation for constellation in extractor.constellation_list if constellation.latin_name == latin_name)
+    constellation = template.copy()
+    with open(os.path.join(fixture_directory, latin_name + '.tsv'), encoding='utf-8') as infile:
+        constellation.addStarTable(TSVTableParser().parseText(infile.read()))
+    constellation.convertCoordinates()
+    constellation.resolveConnections()
+    return constellation
+
+def test_star_pixel_coordinates():
+    constellation = loadConstellation('Orion')
+    constellation.scaleCoordinates(800, 600, 10)
+    x, y = constellation.getViewCoordinates()
+    star = constellation.star_list[3]
+    assert star.x == x[3] and star.y == y[3]
+    assert 10 <= star.x <= 790 and 10 <= star.y <= 590
+    assert (star.unit_x, star.unit_y, star.unit_z) == (constellation.x[3], constellation.y[3], constellation.z[3])
+    assert np.isclose(star.unit_x ** 2 + star.unit_y ** 2 + star.unit_z ** 2, 1.0)
+
+def test_connections_follow_the_edges():
+    constellation = loadConstellation('Orion')
+    edges, bounds = constellation.getEdgesByOrigin()
+    assert constellation.getEdgesByOrigin()[0] is edges
+    origin = int(edges[0, 0])
+    expected = constellation.star_id[edges[bounds[origin]:bounds[origin + 1], 1]].tolist()
+    assert constellation.star_list[origin].connections == expected
+    # New stars and new edges rebuild the sorted edges
+    constellation.appendStars([9999], [999999], [9.0], [''], ['05 00 00.0'], ['+00 00 00'])
+    assert len(constellation.getEdgesByOrigin()[1]) == len(constellation.star_id) + 1
+    constellation.connection_list = constellation.connection_list[:2]
+    constellation.resolveConnections()
+    assert len(constellation.getEdgesByOrigin()[0]) == 1
+
+def makeConstellation(right_ascensions: list, declinations: list):
+    constellation = extractor.constellation_list[0].copy()
+    count = len(right_ascensions)
+    constellation.appendStars(list(range(1, count + 1)), list(range(100, 100 + count)), [1.0] * count, [''] * count, right_ascensions, declinations)
+    constellation.convertCoordinates()
+    constellation.resolveConnections()
+    return constellation
+
+def test_single_star_is_drawn():
+    constellation = makeConstellation(['05 55 10.3'], ['+07 24 25'])
+    constellation.scaleCoordinates(800, 600, 10)
+    x, y = constellation.getViewCoordinates()
+    assert (x.tolist(), y.tolist()) == ([10.0], [10.0])
+    assert len(constellation.getScene().x) == 1
+
+def test_json_without_nan():
+    constellation = makeConstellation(['05 55 10.3', 'invalid', '06 10 00.0'], ['+07 24 25', '+00 00 00', '+10 00 00'])
+    constellation.scaleCoordinates(800, 600, 10)
+    text = extractor.formatJSON(constellation.getJSONData())
+    stars = json.loads(text, parse_constant=lambda constant: pytest.fail('invalid JSON constant ' + constant))['stars']
+    assert [star['x'] is None for star in stars] == [False, True, False]
+    assert stars[1]['y'] is None
+
+class SlowFetcher():
+    """Returns the fixture page of Orion for every url after a delay, like a PageFetcher without cache."""
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.fetch_times = {}
+
+    def fetch(self, url: str):
+        time.sleep(self.delay)
+        self.fetch_times[url] = self.delay
+        with open(os.path.join(fixture_directory, 'Orion.tsv'), encoding='utf-8') as infile:
+            return infile.read()
+
+def test_streamed_download_is_not_parse_time(monkeypatch):
+    monkeypatch.setitem(extractor.sources, 'fetcher', (None, SlowFetcher(0.2)))
+    options = extractor.ExtractorOptions(page_size=1000, offline=True)
+    constellation = next(constellation for constellation in extractor.constellation_list if constellation.latin_name == 'Orion').copy()
+    metrics = extractor.ConstellationMetrics('Orion')
+    extractor.loadStreamedConstellation(constellation, options, metrics)
+    assert len(constellation.star_list) == 200
+    assert metrics.seconds['download'] == pytest.approx(0.2)
+    assert metrics.seconds['parse'] < 0.2
+
+# Pegasus borrows a star of Andromeda, Cygnus uses an overridden abbreviation
+extract_names = ['Andromeda', 'Pegasus', 'Orion', 'Cygnus', 'Lyra', 'Ursa Major']
+
+def readOutputs(directory: str):
+    # Every output file except the metrics of the run, which contain timings
+    outputs = {}
+    for name in sorted(os.listdir(directory)):
+        if name != extractor.metrics_file:
+            with open(os.path.join(directory, name), 'rb') as infile:
+                outputs[name] = infile.read()
+    return outputs
+
+def test_workers_write_the_serial_output(fixture_cache):
+    settings = {'offline': True, 'outputs': ['json', 'png', 'pack']}
+    serial = extractor.extract(extract_names, output_directory='serial', worker_count=1, **settings)
+    parallel = extractor.extract(extract_names, output_directory='parallel', worker_count=2, **settings)
+    assert [result.latin_name for result in parallel] == [result.latin_name for result in serial]
+    serial_outputs = readOutputs('serial')
+    parallel_outputs = readOutputs('parallel')
+    assert sorted(parallel_outputs) == sorted(serial_outputs)
+    assert 'Pegasus.png' in serial_outputs and extractor.packed_file in serial_outputs
+    for name, data in serial_outputs.items():
+        assert parallel_outputs[name] == data, name
+
+def test_manifest_skips_unchanged_constellations(fixture_cache, monkeypatch):
+    settings = {'offline': True, 'outputs': ['json'], 'worker_count': 1}
+    results = {result.latin_name: result for result in extractor.extract(extract_names, **settings)}
+    assert sorted(results) == sorted(extract_names)
+    assert results['Pegasus'].dependencies == ['Andromeda']
+    assert extractor.extract(extract_names, **settings) == []
+    # A changed connection list rebuilds only its own constellation
+    orion = next(constellation for constellation in extractor.constellation_list if constellation.latin_name == 'Orion')
+    monkeypatch.setattr(orion, 'connection_list', orion.connection_list[:-1])
+    assert [result.latin_name for result in extractor.extract(extract_names, **settings)] == ['Orion']
+    # A changed page of Andromeda also rebuilds Pegasus, which borrows one of its stars
+    andromeda = next(constellation for constellation in extractor.constellation_list if constellation.latin_name == 'Andromeda')
+    with open(os.path.join(fixture_directory, 'Andromeda.tsv'), encoding='utf-8') as infile:
+        page = infile.read()
+    ResponseCache(extractor.cache_directory).put(andromeda.table_url, page.replace('# Generated', '# Changed', 1))
+    assert sorted(result.latin_name for result in extractor.extract(extract_names, **settings)) == ['Andromeda', 'Pegasus']
+    assert extractor.extract(extract_names, **settings) == []
+    assert sorted(result.latin_name for result in extractor.extract(extract_names, force_rebuild=True, **settings)) == sorted(extract_names)
@@ -0,0 +1,88 @@
+import pytest
+from TSVTableParser import TSVTableParser
+
+header = ['#', '# IV/27A', '', 'Full\tHD\tRAJ2000\tDEJ2000\tVmag\tBayer', ' \t \t"h:m:s"\t"d:m:s"\tmag\t ', '----\t------\t----------\t---------\t-----\t-----']
+
+def makePage(rows: list, columns: list = None):
+    lines = list(header)
+    if columns is not None:
+        lines[3] = '\t'.join(columns)
+    return '\n'.join(lines + ['\t'.join(str(field) for field in row) for row in rows]) + '\n'
+
+def makeRow(star_id: int, catalogue_number: int, visual_magnitude: str = '3.50', bayer_designation: str = ''):
+    return [star_id, catalogue_number, '05 55 10.3', '+07 24 25', visual_magnitude, bayer_designation]
+
+def test_columns():
+    table = TSVTableParser().parseText(makePage([makeRow(1, 39801, '0.50', 'Alp'), makeRow(2, 34085, '0.12', 'Bet')]))
+    assert table.star_id == [1, 2]
+    assert table.catalogue_number == [39801, 34085]
+    assert table.right_ascension == ['05 55 10.3'] * 2
+    assert table.declination == ['+07 24 25'] * 2
+    assert table.visual_magnitude == [0.5, 0.12]
+    assert table.bayer_designation == ['Alp', 'Bet']
+    assert (table.rows, table.duplicates, table.conversion_failures) == (2, 0, 0)
+
+def test_adjacent_duplicates():
+    table = TSVTableParser().parseText(makePage([makeRow(1, 100), makeRow(2, 100), makeRow(3, 101), makeRow(4, 100)]))
+    # Only adjacent doubles are removed
+    assert table.catalogue_number == [100, 101, 100]
+    assert table.star_id == [1, 3, 4]
+    assert (table.rows, table.duplicates) == (4, 1)
+
+def test_duplicates_across_pages():
+    parser = TSVTableParser()
+    first = parser.parseText(makePage([makeRow(1, 100), makeRow(2, 101)]))
+    second = parser.parseText(makePage([makeRow(3, 101), makeRow(4, 102)]))
+    assert first.catalogue_number == [100, 101]
+    assert second.catalogue_number == [102]
+    assert (second.rows, second.duplicates) == (2, 1)
+    assert parser.rows == 4
+
+def test_row_numbers_without_full_column():
+    columns = ['HD', 'RAJ2000', 'DEJ2000', 'Vmag', 'Bayer']
+    parser = TSVTableParser()
+    first = parser.parseText(makePage([row[1:] for row in (makeRow(0, 100), makeRow(0, 100), makeRow(0, 101))], columns))
+    second = parser.parseText(makePage([makeRow(0, 102)[1:]], columns))
+    # Row numbers count the doubles too and continue on the next page
+    assert first.star_id == [1, 3]
+    assert second.star_id == [4]
+
+def test_missing_column():
+    with pytest.raises(ValueError):
+        TSVTableParser().parseText(makePage([makeRow(1, 100)], ['Full', 'HD', 'RAJ2000', 'DEJ2000', 'Bayer']))
+
+def test_conversion_failures():
+    table = TSVTableParser().parseText(makePage([makeRow(1, 100), makeRow(2, 'x'), makeRow(3, 102, 'bright'), makeRow('', 103)]))
+    assert table.conversion_failures == 3
+    assert table.star_id == [1, -1, -1, -1]
+    assert table.catalogue_number == [100, -1, -1, -1]
+    assert table.visual_magnitude == [3.5, -1.0, -1.0, -1.0]
+    # The coordinates are kept, they are converted separately
+    assert table.right_ascension == ['05 55 10.3'] * 4
+
+def test_chunks():
+    rows = [makeRow(index + 1, 100 + index) for index in range(7)]
+    rows.insert(3, makeRow(0, 102))
+    chunks = list(TSVTableParser().parseChunks(makePage(rows).splitlines(), 3))
+    assert [chunk.catalogue_number for chunk in chunks] == [[100, 101, 102], [103, 104, 105], [106]]
+    assert [(chunk.rows, chunk.duplicates) for chunk in chunks] == [(3, 0), (4, 1), (1, 0)]
+
+def test_chunks_of_exact_size():
+    rows = [makeRow(index + 1, 100 + index) for index in range(6)]
+    chunks = list(TSVTableParser().parseChunks(makePage(rows).splitlines(), 3))
+    assert [len(chunk) for chunk in chunks] == [3, 3]
+
+def test_chunk_larger_than_table():
+    chunks = list(TSVTableParser().parseChunks(makePage([makeRow(1, 100), makeRow(2, 101)]).splitlines(), 10))
+    assert [len(chunk) for chunk in chunks] == [2]
+
+def test_empty_table():
+    assert list(TSVTableParser().parseChunks(makePage([]).splitlines(), 3)) == []
+    # Without chunks there is always exactly one table
+    tables = list(TSVTableParser().parseChunks(makePage([]).splitlines()))
+    assert [len(table) for table in tables] == [0]
+    assert len(TSVTableParser().parseText('')) == 0
+
+def test_only_first_table():
+    page = makePage([makeRow(1, 100)]) + '\n#\n' + makePage([makeRow(2, 200)])
+    assert TSVTableParser().parseText(page).catalogue_number == [100]
@@ -0,0 +1,27 @@
+import os
+import numpy as np
+import pytest
+import StarConstellationExtractor as extractor
+from TSVTableParser import TSVTableParser
+from conftest import fixture_directory
+
+def readCoordinates():
+    right_ascensions = []
+    declinations = []
+    for name in sorted(os.listdir(fixture_directory)):
+        with open(os.path.join(fixture_directory, name), encoding='utf-8') as infile:
+            table = TSVTableParser().parseText(infile.read())
+        right_ascensions += table.right_ascension
+        declinations += table.declination
+    # Edge cases: both poles, zero, the wrap of the right ascension and colon separated values
+    right_ascensions += ['00 00 00.0', '23 59 59.9', '12:30:00', '06 00 00.0']
+    declinations += ['+90 00 00', '-90 00 00', '-00 30 00', '+00 00 00']
+    return right_ascensions, declinations
+
+def test_backends_agree():
+    pytest.importorskip('astropy')
+    right_ascensions, declinations = readCoordinates()
+    numpy_coordinates = extractor.skyToCartesian(right_ascensions, declinations, 'numpy')
+    astropy_coordinates = extractor.skyToCartesian(right_ascensions, declinations, 'astropy')
+    for numpy_values, astropy_values in zip(numpy_coordinates, astropy_coordinates):
+        assert np.max(np.abs(numpy_values - astropy_values)) <= extractor.coordinate_tolerance